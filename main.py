@@ -33,6 +33,70 @@ def create_parser():
         help="'optimization'= Use absolute value formulation. 'feasibility' = Use simple formulation without obj function."
     )
 
+    parser.add_argument(
+        "-b", 
+        "--backend",
+        required=False,
+        default="scipy",
+        type=str,
+        help="'scipy'= Rebuild and solve every LP with scipy's linprog. 'highs' = Keep a persistent HiGHS model and warm start re-solves (requires highspy)."
+    )
+
+    parser.add_argument(
+        "-l", 
+        "--lazy",
+        action="store_true",
+        help="Solve each LP on a working set of clauses and add the violated ones on demand."
+    )
+
+    parser.add_argument(
+        "-d", 
+        "--heuristic",
+        required=False,
+        default="frequency",
+        type=str,
+        help="'frequency'= Branch on the most frequent literal. 'vsids' = Branch on the most active variable (VSIDS). VSIDS reuses the last polarity of the variable (phase saving)."
+    )
+
+    parser.add_argument(
+        "-r", 
+        "--restarts",
+        required=False,
+        default="fixed",
+        type=str,
+        help="Restart schedule of the boolean solver: 'fixed' = after more than 100 conflicts (default), 'luby', 'geometric' or 'glucose' (LBD based)."
+    )
+
+    parser.add_argument(
+        "-p", 
+        "--preprocess",
+        action="store_true",
+        help="Simplify the formula first (subsumption, strengthening, variable and pure literal elimination)."
+    )
+
+    parser.add_argument(
+        "-P", 
+        "--probing",
+        action="store_true",
+        help="Fix the literals forced by failed literal probing and by the LP relaxation (min/max x_i) before solving."
+    )
+
+    parser.add_argument(
+        "-c", 
+        "--components",
+        action="store_true",
+        help="Solve the connected components of the formula separately (in parallel for the large ones), and split the formula left by large fixings."
+    )
+
+    parser.add_argument(
+        "-C", 
+        "--cache_dir",
+        required=False,
+        default=None,
+        type=str,
+        help="Directory of the parsed formulas, keyed by the hash of the file content: later runs on the same file skip parsing."
+    )
+
     return parser
 
 
@@ -47,19 +111,30 @@ if __name__ == "__main__":
 
     filename = args.input_file
     method = args.method
+    backend = args.backend
+    lazy = args.lazy
+    heuristic = args.heuristic
+    restarts = args.restarts
+    preprocess = args.preprocess
+    probing = args.probing
+    components = args.components
+    cache_dir = args.cache_dir
     # lp_solver =  SATasLPOptimization if args.type == "optimization" else SATasLPFeasibility
     # lp_solver =  SATasLPOptimization
     lp_solver =  SATasLPOptimizationDual
     # lp_solver =  SATasLPFeasibility
 
     start = time.time()
-    hyb_solver = HybridSolver(filename, lp_solver, method=method)
-    witness = hyb_solver.optimize(generate_cut=hyb_solver.generate_feas_cut)
+    hyb_solver = HybridSolver(filename, lp_solver, method=method, backend=backend, lazy=lazy, heuristic=heuristic, restarts=restarts, preprocess=preprocess, probing=probing, decompose=components, cache_dir=cache_dir)
+    if components:
+        witness = hyb_solver.optimize_components(generate_cut=hyb_solver.generate_feas_cut)
+    else:
+        witness = hyb_solver.optimize(generate_cut=hyb_solver.generate_feas_cut)
     stop = time.time()
     print(f"Elapsed time: {stop - start}s")
     hyb_solver.verify(witness)
 
-    sat_solver = BooleanSolver(filename, verbose=0)
+    sat_solver = BooleanSolver(filename, verbose=0, heuristic=heuristic, restarts=restarts, cache_dir=cache_dir)
     sat_solver.solve()
 
 
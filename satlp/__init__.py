@@ -5,3 +5,4 @@ from satlp.hyb_solver import HybridSolver
 from satlp.linear_solver import SATasLPFeasibility, SATasLPOptimization, SATasLPOptimizationDual
 from satlp.boolean_solver import BooleanSolver
 from satlp.cnf_loader import CNFLoader
+from satlp.preprocessing import Preprocessor
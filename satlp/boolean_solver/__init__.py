@@ -1,3 +1,4 @@
 from satlp.boolean_solver.cnf_structs import Clause, Formula
 from satlp.boolean_solver.implication_graph import ImplicationGraph
+from satlp.boolean_solver.heuristics import VSIDS, restart_policy
 from satlp.boolean_solver.solver import BooleanSolver
\ No newline at end of file
@@ -1,2 +1,3 @@
 from satlp.boolean_solver.cnf_structs.clause import Clause
-from satlp.boolean_solver.cnf_structs.formula import Formula
\ No newline at end of file
+from satlp.boolean_solver.cnf_structs.formula import Formula
+from satlp.boolean_solver.cnf_structs.clause_arena import ClauseArena
\ No newline at end of file
@@ -0,0 +1,79 @@
+from array import array
+
+import numpy as np
+
+# clause flags
+LEARNT = 1
+DELETED = 2
+# clause stored only as the antecedent of an inference, it is never watched
+DETACHED = 4
+
+class ClauseArena:
+
+    def __init__(self, list_clause=[]):
+        # clause i = literals[offsets[i]:offsets[i]+lengths[i]], growing buffers (amortized O(1) append)
+        self.literals = array('i')
+        self.offsets = array('q')
+        self.lengths = array('i')
+
+        # header per clause
+        self.flags = array('b')
+        self.activity = array('d')
+        self.lbd = array('i')
+
+        for c in list_clause:
+            self.add(c)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def add(self, list_literal, flags=0, lbd=0):
+        # RETURN : the index of the new clause
+        self.offsets.append(len(self.literals))
+        self.lengths.append(len(list_literal))
+        self.literals.extend(list_literal)
+        self.flags.append(flags)
+        self.activity.append(0.0)
+        self.lbd.append(lbd)
+
+        return len(self.offsets) - 1
+
+    def add_flat(self, literals, offsets):
+
+        # appends the clauses literals[offsets[i]:offsets[i+1]] at once
+        # RETURN : the index of the first new clause
+        offsets = np.asarray(offsets, dtype=np.int64)
+        literals = np.asarray(literals, dtype=np.int32)[offsets[0]:offsets[-1]]
+        first, n_new = len(self.offsets), len(offsets) - 1
+        self.offsets.frombytes((offsets[:-1] - offsets[0] + len(self.literals)).tobytes())
+        self.lengths.frombytes(np.diff(offsets).astype(np.int32).tobytes())
+        self.literals.frombytes(literals.tobytes())
+        self.flags.frombytes(bytes(n_new))
+        self.activity.frombytes(np.zeros(n_new).tobytes())
+        self.lbd.frombytes(np.zeros(n_new, dtype=np.int32).tobytes())
+
+        return first
+
+    def clause(self, idx):
+        start = self.offsets[idx]
+        return self.literals[start:start+self.lengths[idx]].tolist()
+
+    def size(self, idx):
+        return self.lengths[idx]
+
+    def is_learnt(self, idx):
+        return self.flags[idx] & LEARNT != 0
+
+    def is_active(self, idx):
+        return self.flags[idx] & (DELETED | DETACHED) == 0
+
+    def active(self):
+        # indices of the clauses that take part in propagation
+        flags = np.frombuffer(self.flags, dtype=np.int8) if len(self.flags) > 0 else np.zeros(0, dtype=np.int8)
+        return np.flatnonzero(flags & (DELETED | DETACHED) == 0).tolist()
+
+    def nbytes(self):
+        return sum(
+            buf.itemsize*len(buf)
+            for buf in [self.literals, self.offsets, self.lengths, self.flags, self.activity, self.lbd]
+        )
\ No newline at end of file
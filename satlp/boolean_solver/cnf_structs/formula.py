@@ -1,11 +1,101 @@
+from array import array
+
 from satlp.boolean_solver.cnf_structs.clause import Clause
+from satlp.boolean_solver.cnf_structs.clause_arena import ClauseArena, LEARNT, DELETED, DETACHED
+from satlp.cnf_loader.cnf_loader import flatten_clauses
 import numpy as np
 
+def group(keys, values, n_values):
+    # RETURN : key -> list of its values (0 .. n_values-1), in increasing order
+    if len(keys) == 0:
+        return {}
+    low = int(keys.min())
+    keys, values = np.divmod(np.sort((keys.astype(np.int64) - low)*n_values + values), n_values)
+    values = values.tolist()
+    bounds = [0] + (np.flatnonzero(np.diff(keys)) + 1).tolist() + [len(values)]
+    return {key + low: values[bounds[i]:bounds[i+1]] for i, key in enumerate(keys[bounds[:-1]].tolist())}
+
 class Formula:
-    
-    def __init__(self, list_clause):
-        self.formula = np.array([Clause(c) for c in list_clause if len(c) > 0])
-        self.value = self.get_value()
+
+    def __init__(self, list_clause=None, literals=None, offsets=None):
+        # clauses as lists or as a flat literal buffer + offsets (see CNFLoader.clause_arrays),
+        # the empty ones are dropped, the others are referenced by their index in the arena
+        if list_clause is not None:
+            literals, offsets = flatten_clauses(list_clause)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        literals = np.asarray(literals, dtype=np.int32)[offsets[0]:offsets[-1]]
+        lengths = np.diff(offsets)
+        offsets = np.append(offsets[:-1][lengths > 0], offsets[-1]) - offsets[0]
+        lengths = lengths[lengths > 0]
+        self.arena = ClauseArena()
+        self.arena.add_flat(literals, offsets)
+        self.variables = set(np.flatnonzero(np.bincount(np.abs(literals))).tolist())
+
+        # two watched literals per clause (first two positions): literal -> clauses watching it
+        self.watches = {}
+        # clauses found unit while attaching, their literal still has to be assigned
+        self.units = []
+        # clauses whose watches have to be checked against the assignment (new clauses)
+        self.recheck = []
+        self.conflict = None
+        # detached antecedents (resolve_pair), deleted once no trail literal refers to them
+        self.detached = []
+
+        # formula status over the original clauses and the required ones added later (the other
+        # clauses added later are implied by them): undetermined, satisfied and falsified clauses
+        # (status[value] for a clause value 0, 1, -1), from the true / false literals of each
+        # clause among the counted trail literals; counted stays a prefix of the trail, it is
+        # caught up lazily (catch_up) and the literals taken off the trail are reverted (undo)
+        self.n_lits = []
+        self.n_true = []
+        self.n_false = []
+        self.required = []
+        self.occurrences = {}
+        self.counted = []
+        self.is_counted = set()
+        self.n_required = 0
+        self.status = [0, 0, 0]
+        # unsatisfied clauses left with two unassigned literals, (x, y) sorted on the variable
+        # -> clauses; kept up to date by the counts from the first binary_index call on, learnt
+        # clauses are then counted too
+        self.binary = None
+        # indexed clause -> its pair, pairs added or invalidated since binary_index last saw them
+        self.pair_of = {}
+        self.changed = set()
+
+        # the clauses start undetermined and required, with their distinct literals in the
+        # occurrences (what track does one clause at a time)
+        m_clauses = len(lengths)
+        n_vars = int(np.abs(literals).max()) if len(literals) > 0 else 0
+        entries = np.sort(np.repeat(np.arange(m_clauses), lengths)*(2*n_vars+1) + literals + n_vars)
+        rows, distinct = np.divmod(entries[np.diff(entries, prepend=-1) != 0], 2*n_vars+1)
+        self.n_lits = np.bincount(rows, minlength=m_clauses).tolist()
+        self.n_true = [0]*m_clauses
+        self.n_false = [0]*m_clauses
+        self.required = [True]*m_clauses
+        self.occurrences = group(distinct - n_vars, rows, m_clauses)
+        self.n_required = m_clauses
+        self.status = [m_clauses, 0, 0]
+
+        # learnt clause activity, bumped when a clause takes part in a conflict
+        self.clause_increment = 1.0
+        self.clause_decay = 0.999
+
+        # the first two literals of each clause are watched
+        starts = offsets[:-1]
+        second = lengths > 1
+        self.watches = group(
+            np.concatenate([literals[starts], literals[starts[second] + 1]]),
+            np.concatenate([np.arange(m_clauses), np.flatnonzero(second)]),
+            m_clauses,
+        )
+        self.units = np.flatnonzero(lengths == 1).tolist()
+
+        self.value = 0
+
+    @property
+    def formula(self):
+        return [Clause(self.arena.clause(c)) for c in self.arena.active()]
 
     def print_info(self):
         for c in self.formula:
@@ -13,185 +103,548 @@ class Formula:
         print('[F] Truth value: ', self.value)
 
     def get_value(self):
-        list_values = [c.value for c in self.formula]
-        if -1 in list_values:
-            return -1
+        return self.value
+
+    def update_value(self, graph):
+        # -1 = conflict, 1 = every clause satisfied, 0 = otherwise
+        if self.conflict is not None:
+            self.value = -1
+        elif len(self.units) == 0 and self.is_satisfied(graph):
+            self.value = 1
         else:
-            if 0 in list_values:
-                return 0
-            else: 
-                return 1 
+            self.value = 0
 
-    def get_counter(self):
+        return self.value
 
-        # change this
-        counter = {}
-        for clause in self.formula:
-            for literal in clause.clause[:clause.size]:
-                if literal in counter:
-                    counter[literal] += 1
-                else:
-                    counter[literal] = 1 
+    @property
+    def n_undetermined(self):
+        return self.status[0]
+
+    @property
+    def n_satisfied(self):
+        return self.status[1]
+
+    @property
+    def n_falsified(self):
+        return self.status[-1]
+
+    def track(self, c, required=False):
+        # counts of a new arena clause: it joins them if required, or if learnt once the binary
+        # index is kept (detached clauses never do)
+        self.n_lits.append(len(set(self.arena.clause(c))))
+        self.n_true.append(0)
+        self.n_false.append(0)
+        self.required.append(required)
+        if required or (self.binary is not None and self.arena.is_active(c)):
+            self.count_clause(c)
+
+    def count_clause(self, c):
+        # adds c to the occurrences, with the counted literals it already has
+        is_counted = self.is_counted
+        literals = set(self.arena.clause(c))
+        for literal in literals:
+            if literal in self.occurrences:
+                self.occurrences[literal].append(c)
+            else:
+                self.occurrences[literal] = [c]
+        self.n_true[c] = sum(1 for xi in literals if xi in is_counted)
+        self.n_false[c] = sum(1 for xi in literals if -xi in is_counted)
+
+        value = self.clause_value(c)
+        if self.required[c]:
+            self.n_required += 1
+            self.status[value] += 1
+        if value == 0 and self.n_lits[c] - self.n_false[c] == 2 and self.binary is not None:
+            self.index_pair(c)
+
+    def clause_value(self, c):
+        # from the counts: 1 = satisfied, -1 = falsified, 0 = undetermined
+        if self.n_true[c] > 0:
+            return 1
+        return -1 if self.n_false[c] == self.n_lits[c] else 0
+
+    def count(self, literal):
+        # literal is true: counts of the clauses containing it or its negation
+        n_true, n_false, n_lits, required, status = self.n_true, self.n_false, self.n_lits, self.required, self.status
+        self.is_counted.add(literal)
+        self.counted.append(literal)
+        for c in self.occurrences.get(literal, ()):
+            n_true[c] += 1
+            if n_true[c] == 1:
+                if required[c]:
+                    status[0] -= 1
+                    status[1] += 1
+                if c in self.pair_of:
+                    self.unindex(c)
+        for c in self.occurrences.get(-literal, ()):
+            n_false[c] += 1
+            if n_true[c] == 0:
+                left = n_lits[c] - n_false[c]
+                if left == 0 and required[c]:
+                    status[0] -= 1
+                    status[-1] += 1
+                elif left == 2 and self.binary is not None:
+                    self.index_pair(c)
+                elif left == 1 and c in self.pair_of:
+                    self.unindex(c)
+
+    def uncount(self, literal):
+        # reverts count(literal)
+        n_true, n_false, n_lits, required, status = self.n_true, self.n_false, self.n_lits, self.required, self.status
+        self.is_counted.discard(literal)
+        for c in self.occurrences.get(literal, ()):
+            n_true[c] -= 1
+            if n_true[c] == 0:
+                left = n_lits[c] - n_false[c]
+                if required[c]:
+                    status[1] -= 1
+                    status[-1 if left == 0 else 0] += 1
+                if left == 2 and self.binary is not None:
+                    self.index_pair(c)
+        for c in self.occurrences.get(-literal, ()):
+            n_false[c] -= 1
+            if n_true[c] == 0:
+                left = n_lits[c] - n_false[c]
+                if left == 1 and required[c]:
+                    status[-1] -= 1
+                    status[0] += 1
+                elif left == 2 and self.binary is not None:
+                    self.index_pair(c)
+                elif left == 3 and c in self.pair_of:
+                    self.unindex(c)
+
+    def catch_up(self, graph):
+        # counts the trail literals assigned since the last call
+        trail, counted = graph.trail, self.counted
+        if len(counted) > len(trail) or (len(counted) > 0 and trail[len(counted)-1] != counted[-1]):
+            # no longer a prefix of the trail (an undo was missed): the counts start over
+            self.undo(list(counted))
+        for literal in trail[len(self.counted):]:
+            self.count(literal)
+
+    def undo(self, removed):
+        # literals taken off the trail: their counts are reverted, the other literals keep their
+        # order on the trail, so counted stays a prefix of it
+        removed = [xi for xi in removed if xi in self.is_counted]
+        if len(removed) == 0:
+            return
+
+        gone = set(removed)
+        for literal in reversed(removed):
+            self.uncount(literal)
+        counted = self.counted
+        top = len(counted) - len(removed)
+        if all(xi in gone for xi in counted[top:]):
+            # popped from the top of the trail
+            del counted[top:]
+        else:
+            self.counted = [xi for xi in counted if xi not in gone]
 
-        ## Lazy counter
+    def is_satisfied(self, graph):
+        self.catch_up(graph)
 
-        unassigned_refs = []
-        for clause in self.formula:
-            if clause.size == 1:
-                unassigned_refs.append(clause.clause[0])
-            elif clause.size > 1:
-                for xi in clause.clause[clause.size:]:
-                    unassigned_refs.append(xi)
+        return self.status[1] == self.n_required
 
-        for literal in unassigned_refs:
-            if literal in counter:
-                counter[literal] += 1
+    def index_pair(self, c):
+        # c has two literals left by the counted ones
+        is_counted = self.is_counted
+        pair = tuple(sorted({xi for xi in self.arena.clause(c) if -xi not in is_counted}, key=abs))
+        if len(pair) == 2 and self.pair_of.get(c) != pair:
+            self.unindex(c)
+            if pair in self.binary:
+                self.binary[pair].add(c)
             else:
-                counter[literal] = 1 
+                self.binary[pair] = {c}
+            self.pair_of[c] = pair
+            self.changed.add(pair)
+
+    def unindex(self, c):
+        # c is no longer left with two literals (or is deleted)
+        pair = self.pair_of.pop(c, None)
+        if pair is not None:
+            cs = self.binary[pair]
+            cs.discard(c)
+            if len(cs) == 0:
+                del self.binary[pair]
+            self.changed.add(pair)
+
+    def literals(self, c):
+        return self.arena.clause(c)
+
+    def remaining(self, c, graph):
+        # unassigned literals of the clause, None if the clause is satisfied
+        lits = []
+        for xi in self.arena.clause(c):
+            value = graph.value(xi)
+            if value == 1:
+                return None
+            elif value == 0:
+                lits.append(xi)
+
+        return lits
+
+    def get_counter(self, graph, exclude=[]):
+
+        # occurrences of the unassigned literals of unsatisfied clauses, most frequent first
+        exclude = {abs(xi) for xi in exclude}
+        counter = {}
+        for c in self.arena.active():
+            lits = self.remaining(c, graph)
+            if lits is None:
+                continue
+            for literal in lits:
+                if abs(literal) not in exclude:
+                    if literal in counter:
+                        counter[literal] += 1
+                    else:
+                        counter[literal] = 1
+
         counter = {k: freq for k, freq in sorted(counter.items(), key=lambda item: item[1], reverse= True)}
-        assert len(counter) > 0
         return counter
 
     def is_sat(self):
         return self.value
-    
-    def simplify_pair(self, pair_idx, graph, decision_level):
 
-        assigned_vars = graph.assigned_vars
-        pair = self.formula[pair_idx]
-        for cl in self.formula[pair_idx:]:
-            if cl.size == 2:
-                if cl != pair:
-                    _cl = np.array(sorted(cl.clause[:cl.size], key=abs))
-                    _pair = np.array(sorted(pair.clause[:pair.size], key=abs))
-                    idx = (_cl == _pair)
-
-                    if idx.sum() == 1:
-                        if _cl[idx] == _pair[idx] and _cl[~idx] == -_pair[~idx]:
-                            new_inf = _pair[idx].item()
-                            dl = [-1 for i in range(len(cl.clause))]
-
-                            all_xi = cl.clause + pair.clause
-                            new_clause = pair.clause[pair.size:] + cl.clause[cl.size:] + [new_inf]
+    def watch(self, c):
+        start = self.arena.offsets[c]
+        for literal in self.arena.literals[start:start+min(2, self.arena.lengths[c])]:
+            if literal in self.watches:
+                self.watches[literal].append(c)
+            else:
+                self.watches[literal] = [c]
+
+    def unwatch(self, c):
+        start = self.arena.offsets[c]
+        for literal in self.arena.literals[start:start+min(2, self.arena.lengths[c])]:
+            watchers = self.watches.get(literal, [])
+            if c in watchers:
+                watchers.remove(c)
+
+    def attach(self, c, graph):
+
+        # move the best watch candidates to the front: true literals, unassigned ones,
+        # then false literals from the highest decision level down
+        self.unwatch(c)
+        def key(xi):
+            value = graph.value(xi)
+            if value == 1:
+                return (0, graph.level(xi))
+            elif value == 0:
+                return (1, 0)
+            return (2, -graph.level(xi))
+
+        arena = self.arena
+        start, size = arena.offsets[c], arena.lengths[c]
+        arena.literals[start:start+size] = array('i', sorted(arena.clause(c), key=key))
+        self.watch(c)
+
+        first = graph.value(arena.literals[start])
+        if first == -1:
+            if self.conflict is None:
+                self.conflict = c
+        elif first == 0:
+            if size == 1 or graph.value(arena.literals[start+1]) == -1:
+                self.units.append(c)
+
+    def binary_index(self, graph):
+
+        # RETURN : (x, y) -> the first clause left with the two unassigned literals x and y, for
+        # the pairs added or invalidated since resolve_pair last visited them (the others were
+        # already resolved against the index), from the binary clause index (see __init__)
+        # built by one pass over the clauses on the first call
+        self.catch_up(graph)
+        if self.binary is None:
+            self.binary = {}
+            for c in self.arena.active():
+                if not self.required[c]:
+                    self.count_clause(c)
+                elif self.n_true[c] == 0 and self.n_lits[c] - self.n_false[c] == 2:
+                    self.index_pair(c)
+
+        self.changed = {pair for pair in self.changed if pair in self.binary}
+
+        return {pair: min(self.binary[pair]) for pair in self.changed}
+
+    def is_pair(self, c, pair, graph):
+        lits = self.remaining(c, graph)
+        return lits is not None and tuple(sorted(lits, key=abs)) == pair
+
+    def resolve_pair(self, pair, pair_idx, graph):
+
+        # [~p, q] and [p, q] (restricted to their unassigned literals) imply q, the partner
+        # clause is looked up in the binary index; entries made stale by new assignments are skipped
+        self.changed.discard(pair)
+        if not self.is_pair(pair_idx, pair, graph):
+            return None, None
+
+        x, y = pair
+        for new_inf, partner in [(x, (x, -y)), (y, (-x, y))]:
+            cs = self.binary.get(partner)
+            if cs is None:
+                continue
+            c = min(cs)
+            if not self.is_pair(c, partner, graph):
+                continue
 
-                            dl = [pair.decision_level[pair.clause.index(xi)] if xi in pair.clause else cl.decision_level[cl.clause.index(xi)] for xi in new_clause]
-                            dl[-1] = decision_level
+            # the resolvent of both clauses is the antecedent of the inference
+            false_lits = []
+            for xi in self.arena.clause(pair_idx) + self.arena.clause(c):
+                if graph.value(xi) == -1 and xi not in false_lits:
+                    false_lits.append(xi)
 
-                            new_clause = Clause(new_clause)
-                            new_clause.decision_level = dl
-                            new_clause.size = 0
-                            new_clause.value = 1
+            antecedent = self.arena.add([new_inf] + false_lits, flags=DETACHED)
+            self.track(antecedent)
+            self.detached.append(antecedent)
 
-                            return new_inf, new_clause
+            return new_inf, antecedent
 
         return None, None
-        
-    def bcp(self, literal, decision_level, graph):
-        conflict_clause = None
-        for clause in self.formula:
-            if clause.value == -1:
-                self.value = -1
-                conflict_clause = clause
-                break
-
-            elif clause.value == 0:
-                # clause.print_info()
-                assert clause.size > 0
-                # Implication graph is used when the lazy clause is visited
-                if clause.bcp(literal, decision_level, graph) == -1:
-                    self.value = -1
-                    conflict_clause = clause
-                    break
 
-            elif clause.value == 1:
+    def visit_watchers(self, literal, decision_level, graph):
+
+        # literal is true: only the clauses watching its negation are visited, all of them,
+        # since assignments at the fixing level survive a conflict; implied literals go on the trail
+        false_lit = -literal
+        watchers = self.watches.get(false_lit, [])
+        lits, offsets, lengths = self.arena.literals, self.arena.offsets, self.arena.lengths
+        kept = []
+        conflicts = []
+        for c in watchers:
+
+            start = offsets[c]
+            size = lengths[c]
+            if size == 1:
+                kept.append(c)
+                conflicts.append(c)
                 continue
-                
-        self.value = self.get_value()
 
-        return self.value, conflict_clause
-            
-    def bcp2(self, literal, decision_level, graph):
-        conflict_clauses = []
-        for clause in self.formula:
-            if clause.value == -1:
-                self.value = -1
-                conflict_clauses += [clause]
-
-            elif clause.value == 0:
-                # clause.print_info()
-                assert clause.size > 0
-                # Implication graph is used when the lazy clause is visited
-                if clause.bcp(literal, decision_level, graph) == -1:
-                    self.value = -1
-                    conflict_clauses += [clause]
-
-            elif clause.value == 1:
+            if lits[start] == false_lit:
+                lits[start], lits[start+1] = lits[start+1], false_lit
+
+            first = lits[start]
+            value = graph.value(first)
+            if value == 1:
+                kept.append(c)
                 continue
-                
-        self.value = self.get_value()
 
-        return self.value, conflict_clauses
+            # look for a new literal to watch
+            for k in range(start+2, start+size):
+                if graph.value(lits[k]) != -1:
+                    new_watch = lits[k]
+                    lits[start+1], lits[k] = new_watch, false_lit
+                    if new_watch in self.watches:
+                        self.watches[new_watch].append(c)
+                    else:
+                        self.watches[new_watch] = [c]
+                    break
 
-    def unit_propagate(self, decision_level, graph=None):
-        nb_clauses = len(self.formula)
-        i = 0
-        conflict_clause = None
-        while i< nb_clauses and self.value == 0:
-            clause = self.formula[i]
-            if clause.is_unit():  
+            else:
+                kept.append(c)
+                if value == -1:
+                    conflicts.append(c)
+                else:
+                    graph.add_node(first, c, decision_level)
 
-                unit_literal = clause.clause[0]
-                if graph is not None and (unit_literal not in graph.assigned_vars):
-                    graph.add_node(unit_literal, clause, decision_level)
-                is_sat, conflict_clause = self.bcp(unit_literal, decision_level, graph)
+        self.watches[false_lit] = kept
 
-                if is_sat == -1:
-                    self.value == -1
+        return conflicts
 
-                else:
-                    self.value, conflict_clause = self.unit_propagate(decision_level, graph) 
-                    break
-            else: 
-                i += 1
+    def propagate(self, decision_level, graph):
 
-        return self.value, conflict_clause
+        # RETURN : the conflicting clauses found by the first literal producing any
+        conflicts = [] if self.conflict is None else [self.conflict]
 
-    def unit_propagate2(self, decision_level, graph=None):
-        nb_clauses = len(self.formula)
-        i = 0
-        conflict_clauses = []
-        while i< nb_clauses and self.value == 0:
-            clause = self.formula[i]
-            if clause.is_unit():  
+        # units found while attaching clauses
+        lits, offsets = self.arena.literals, self.arena.offsets
+        for c in self.units:
+            unit_literal = lits[offsets[c]]
+            value = graph.value(unit_literal)
+            if value == 0:
+                graph.add_node(unit_literal, c, decision_level)
+            elif value == -1:
+                conflicts.append(c)
+        self.units = []
 
-                unit_literal = clause.clause[0]
-                if graph is not None and (unit_literal not in graph.assigned_vars):
-                    graph.add_node(unit_literal, clause, decision_level)
+        # FIFO over the trail: every assigned literal after qhead still has to be propagated
+        trail = graph.trail
+        while len(conflicts) == 0 and graph.qhead < len(trail):
+            literal = trail[graph.qhead]
+            graph.qhead += 1
+            conflicts += self.visit_watchers(literal, decision_level, graph)
 
-                is_sat, _clauses = self.bcp2(unit_literal, decision_level, graph)
-                conflict_clauses += _clauses
+        if len(conflicts) > 0 and self.conflict is None:
+            self.conflict = conflicts[0]
 
-                if is_sat == -1:
-                    self.value == -1
+        self.update_value(graph)
 
-                else:
-                    self.value, _clauses = self.unit_propagate2(decision_level, graph) 
-                    conflict_clauses += _clauses
-            else: 
-                i += 1
+        return conflicts
 
-        return self.value, conflict_clauses
+    def bcp(self, literal, decision_level, graph):
+        # literal is already on the trail, propagation runs up to a fixed point or a conflict
+        self.propagate(decision_level, graph)
+
+        return self.value, self.conflict
 
+    def bcp2(self, literal, decision_level, graph):
+        conflicts = self.propagate(decision_level, graph)
+
+        return self.value, conflicts
+
+    def check_added(self, graph):
+        for c in self.recheck:
+            self.attach(c, graph)
+        self.recheck = []
+
+    def unit_propagate(self, decision_level, graph=None):
+
+        self.check_added(graph)
+        self.propagate(decision_level, graph)
+
+        return self.value, self.conflict
+
+    def unit_propagate2(self, decision_level, graph=None):
+
+        self.check_added(graph)
+        conflict_clauses = self.propagate(decision_level, graph)
+
+        return self.value, conflict_clauses
 
-    def backtrack(self, backtrack_level, graph):
-        for clause in self.formula:
-            clause.restore(backtrack_level, graph)
+    def backtrack(self, backtrack_level, graph, removed=()):
+        # watches stay valid when assignments are undone from the top of the trail, the counts
+        # of the removed literals are reverted
+        self.undo(removed)
+        self.units = []
+        self.conflict = None
         self.value = 0
 
-    def repair(self, lit, graph):
-        for clause in self.formula:
-            clause.repair_hypothesis(lit, graph)
+    def clear(self):
+        # the whole assignment was undone: only the unit clauses have something to propagate
+        self.units = [c for c in self.arena.active() if self.arena.size(c) == 1]
+        self.conflict = None
         self.value = 0
 
-    def add_clause(self, clause):
-        self.formula = np.append(self.formula, clause)
\ No newline at end of file
+    def repair(self, graph):
+        # assignments were removed out of order, so every clause picks its watches again
+        self.units = []
+        self.conflict = None
+        for c in self.arena.active():
+            self.attach(c, graph)
+        graph.qhead = len(graph.trail)
+        self.update_value(graph)
+
+    def add_clause(self, clause, learnt=True, required=False):
+        # required = not implied by the clauses so far, it joins the formula status
+        # RETURN : the index of the clause in the arena
+        c = self.arena.add(clause.clause, flags=LEARNT if learnt else 0, lbd=clause.lbd)
+        self.track(c, required=required)
+        self.variables.update(abs(xi) for xi in clause.clause)
+        self.watch(c)
+        self.recheck.append(c)
+
+        return c
+
+    def n_learnts(self):
+        flags = np.array(self.arena.flags, dtype=np.int8)
+        return int(np.sum((flags & LEARNT != 0) & (flags & (DELETED | DETACHED) == 0)))
+
+    def bump_clause(self, c):
+        if self.arena.is_learnt(c):
+            activity = self.arena.activity
+            activity[c] += self.clause_increment
+            if activity[c] > 1e20:
+                for i in range(len(activity)):
+                    activity[i] *= 1e-20
+                self.clause_increment *= 1e-20
+
+    def decay_clause_activity(self):
+        self.clause_increment /= self.clause_decay
+
+    def reduce_db(self, graph):
+
+        # keeps glue clauses (LBD <= 2) and antecedents of the current assignment,
+        # evicts half of the other learnt clauses: highest LBD first, then lowest activity
+        # RETURN : the number of evicted clauses
+        arena = self.arena
+        flags = np.array(arena.flags, dtype=np.int8)
+        lbd = np.array(arena.lbd, dtype=np.int32)
+        activity = np.array(arena.activity, dtype=np.float64)
+
+        candidates = (flags & LEARNT != 0) & (flags & (DELETED | DETACHED) == 0) & (lbd > 2)
+        locked = [graph.reasons[abs(xi)] for xi in graph.trail]
+        locked = [c for c in locked if c is not None]
+        candidates[locked] = False
+        candidates[self.recheck + self.units] = False
+
+        idx = np.flatnonzero(candidates)
+        order = np.lexsort((activity[idx], -lbd[idx]))
+        evicted = idx[order[:len(idx)//2]].tolist()
+        for c in evicted:
+            self.unwatch(c)
+            arena.flags[c] |= DELETED
+
+        # counted learnt clauses (binary index kept) leave the counts and the index
+        if self.binary is not None and len(evicted) > 0:
+            gone = set(evicted)
+            self.occurrences = {literal: [c for c in cs if c not in gone] for literal, cs in self.occurrences.items()}
+            for c in evicted:
+                self.unindex(c)
+
+        self.collect_detached(graph)
+
+        return len(evicted)
+
+    def collect_detached(self, graph):
+
+        # deletes the detached antecedents no trail literal refers to, the arena is compacted
+        # once most of it is garbage; called between conflicts only, as compact renumbers
+        # the clauses
+        # RETURN : the number of deleted clauses
+        locked = {graph.reasons[abs(xi)] for xi in graph.trail}
+        deleted = [c for c in self.detached if c not in locked]
+        self.detached = [c for c in self.detached if c in locked]
+        for c in deleted:
+            self.arena.flags[c] |= DELETED
+
+        flags = np.array(self.arena.flags, dtype=np.int8)
+        if 2*np.count_nonzero(flags & DELETED) > len(self.arena):
+            self.compact(graph)
+
+        return len(deleted)
+
+    def compact(self, graph):
+
+        # rebuilds the arena without the deleted clauses and remaps every clause reference
+        old = self.arena
+        self.arena = ClauseArena()
+        remap = {}
+        for c in range(len(old)):
+            if old.flags[c] & DELETED == 0:
+                remap[c] = self.arena.add(old.clause(c), flags=old.flags[c], lbd=old.lbd[c])
+                self.arena.activity[remap[c]] = old.activity[c]
+
+        self.watches = {}
+        for c in range(len(self.arena)):
+            if self.arena.is_active(c):
+                self.watch(c)
+
+        for xi in graph.trail:
+            reason = graph.reasons[abs(xi)]
+            if reason is not None:
+                graph.reasons[abs(xi)] = remap[reason]
+
+        self.units = [remap[c] for c in self.units]
+        self.recheck = [remap[c] for c in self.recheck]
+        self.detached = [remap[c] for c in self.detached]
+
+        # the counts move with their clauses
+        kept = list(remap)
+        self.n_lits = [self.n_lits[c] for c in kept]
+        self.n_true = [self.n_true[c] for c in kept]
+        self.n_false = [self.n_false[c] for c in kept]
+        self.required = [self.required[c] for c in kept]
+        self.occurrences = {literal: [remap[c] for c in cs] for literal, cs in self.occurrences.items()}
+        if self.binary is not None:
+            self.binary = {pair: {remap[c] for c in cs if c in remap} for pair, cs in self.binary.items()}
+            self.pair_of = {remap[c]: pair for c, pair in self.pair_of.items() if c in remap}
+        if self.conflict is not None:
+            self.conflict = remap[self.conflict]
\ No newline at end of file
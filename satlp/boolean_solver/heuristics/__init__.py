@@ -0,0 +1,9 @@
+from satlp.boolean_solver.heuristics.vsids import VSIDS
+from satlp.boolean_solver.heuristics.restarts import (
+    RestartPolicy,
+    FixedRestart,
+    LubyRestart,
+    GeometricRestart,
+    GlucoseRestart,
+    restart_policy,
+)
\ No newline at end of file
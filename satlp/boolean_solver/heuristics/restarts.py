@@ -0,0 +1,101 @@
+from collections import deque
+
+def luby(i):
+    # i-th term (from 0) of the Luby sequence 1 1 2 1 1 2 4 1 1 2 ...
+    size, seq = 1, 0
+    while size < i + 1:
+        seq += 1
+        size = 2*size + 1
+
+    while size - 1 != i:
+        size = (size - 1) >> 1
+        seq -= 1
+        i = i % size
+
+    return 2**seq
+
+class RestartPolicy:
+
+    def __init__(self):
+        # conflicts since the last restart
+        self.conflicts = 0
+        self.restarts = 0
+
+    def on_conflict(self, lbd):
+        self.conflicts += 1
+
+    def should_restart(self):
+        return False
+
+    def on_restart(self):
+        self.conflicts = 0
+        self.restarts += 1
+
+class FixedRestart(RestartPolicy):
+
+    def __init__(self, rate=100):
+        super().__init__()
+        self.rate = rate
+
+    def should_restart(self):
+        # after more than rate conflicts, as the solver always did
+        return self.conflicts > self.rate
+
+class LubyRestart(RestartPolicy):
+
+    def __init__(self, unit=100):
+        super().__init__()
+        self.unit = unit
+
+    def should_restart(self):
+        return self.conflicts >= self.unit*luby(self.restarts)
+
+class GeometricRestart(RestartPolicy):
+
+    def __init__(self, first=100, factor=1.5):
+        super().__init__()
+        self.first = first
+        self.factor = factor
+
+    def should_restart(self):
+        return self.conflicts >= self.first*self.factor**self.restarts
+
+class GlucoseRestart(RestartPolicy):
+
+    def __init__(self, window=50, k=0.8):
+        super().__init__()
+        self.k = k
+        # LBD of the last learnt clauses against the LBD average of the whole search
+        self.recent = deque(maxlen=window)
+        self.lbd_sum = 0
+        self.n_lbd = 0
+
+    def on_conflict(self, lbd):
+        super().on_conflict(lbd)
+        self.recent.append(lbd)
+        self.lbd_sum += lbd
+        self.n_lbd += 1
+
+    def should_restart(self):
+        # recent clauses are worse than usual: the search is stuck in a bad region
+        if len(self.recent) < self.recent.maxlen:
+            return False
+        return self.k*sum(self.recent)/len(self.recent) > self.lbd_sum/self.n_lbd
+
+    def on_restart(self):
+        super().on_restart()
+        self.recent.clear()
+
+def restart_policy(name, rate=100):
+    # 'fixed' = after more than rate conflicts (default), 'luby' = rate*luby(i), 'geometric' = rate*1.5^i,
+    # 'glucose' = when the recent learnt clauses have a high LBD
+    policies = {
+        'fixed': lambda: FixedRestart(rate=rate),
+        'luby': lambda: LubyRestart(unit=rate),
+        'geometric': lambda: GeometricRestart(first=rate),
+        'glucose': lambda: GlucoseRestart(),
+    }
+    if name not in policies:
+        raise ValueError(f"Unknown restart policy '{name}', expected one of {list(policies)}")
+
+    return policies[name]()
\ No newline at end of file
@@ -0,0 +1,126 @@
+class VSIDS:
+
+    def __init__(self, n_vars, decay=0.95, activity=None, phase=None, saving=True):
+        self.n_vars = n_vars
+        self.decay = decay
+        self.increment = 1.0
+
+        # activity per variable, bumped on conflicts and decayed by growing the increment
+        self.activity = [0.0]*(n_vars+1) if activity is None else list(activity)
+        # polarity of the picked literal (True = positive), the last value of the variable
+        # with phase saving
+        self.phase = [False]*(n_vars+1) if phase is None else list(phase)
+        self.saving = saving
+
+        # binary max-heap of variables on activity, position[var] = index in heap or -1
+        self.heap = []
+        self.position = [-1]*(n_vars+1)
+        self.reset()
+
+    def reset(self):
+        # every variable back in the heap (e.g. after a restart with an empty assignment)
+        self.heap = sorted(range(1, self.n_vars+1), key=lambda var: -self.activity[var])
+        self.position = [-1]*(self.n_vars+1)
+        for i, var in enumerate(self.heap):
+            self.position[var] = i
+
+    def grow(self, n_vars):
+        # new variables, inactive and negative until they are bumped or saved
+        for var in range(self.n_vars+1, n_vars+1):
+            self.activity.append(0.0)
+            self.phase.append(False)
+            self.position.append(-1)
+            self.insert(var)
+        self.n_vars = max(self.n_vars, n_vars)
+
+    def sift_up(self, i):
+        heap, position, activity = self.heap, self.position, self.activity
+        var = heap[i]
+        while i > 0:
+            parent = (i - 1) >> 1
+            if activity[heap[parent]] >= activity[var]:
+                break
+            heap[i] = heap[parent]
+            position[heap[i]] = i
+            i = parent
+        heap[i] = var
+        position[var] = i
+
+    def sift_down(self, i):
+        heap, position, activity = self.heap, self.position, self.activity
+        var = heap[i]
+        size = len(heap)
+        while True:
+            child = 2*i + 1
+            if child >= size:
+                break
+            if child + 1 < size and activity[heap[child+1]] > activity[heap[child]]:
+                child += 1
+            if activity[heap[child]] <= activity[var]:
+                break
+            heap[i] = heap[child]
+            position[heap[i]] = i
+            i = child
+        heap[i] = var
+        position[var] = i
+
+    def insert(self, var):
+        if self.position[var] < 0:
+            self.heap.append(var)
+            self.position[var] = len(self.heap) - 1
+            self.sift_up(len(self.heap) - 1)
+
+    def pop(self):
+        var = self.heap[0]
+        last = self.heap.pop()
+        self.position[var] = -1
+        if len(self.heap) > 0:
+            self.heap[0] = last
+            self.position[last] = 0
+            self.sift_down(0)
+
+        return var
+
+    def reinsert(self, literals):
+        # unassigned literals become candidates again, their polarity is saved for the next decision
+        for literal in literals:
+            if self.saving:
+                self.phase[abs(literal)] = literal > 0
+            self.insert(abs(literal))
+
+    def bump(self, variables):
+        for var in variables:
+            self.activity[var] += self.increment
+            if self.activity[var] > 1e100:
+                self.rescale()
+            if self.position[var] >= 0:
+                self.sift_up(self.position[var])
+
+    def rescale(self):
+        self.activity = [a*1e-100 for a in self.activity]
+        self.increment *= 1e-100
+
+    def decay_activity(self):
+        # EVSIDS: decaying every activity = growing the next bumps
+        self.increment /= self.decay
+
+    def pick(self, graph, exclude=[]):
+
+        # most active unassigned variable, excluded variables are put back afterwards
+        exclude = {abs(xi) for xi in exclude}
+        skipped = []
+        decision = None
+        while len(self.heap) > 0:
+            var = self.pop()
+            if graph.value(var) != 0:
+                continue
+            if var in exclude:
+                skipped.append(var)
+                continue
+            decision = var if self.phase[var] else -var
+            break
+
+        for var in skipped:
+            self.insert(var)
+
+        return decision
\ No newline at end of file
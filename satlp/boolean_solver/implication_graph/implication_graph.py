@@ -1,35 +1,151 @@
 class ImplicationGraph:
 
-    def __init__(self):
-        self.graph = dict()
-        self.assigned_vars = []
-        
+    def __init__(self, n_vars=0):
+        # per variable: sign of its assigned literal (0 = unassigned), antecedent and level;
+        # plain lists, read one variable at a time on the propagation hot path
+        self.values = [0]*(n_vars+1)
+        self.levels = [-1]*(n_vars+1)
+        self.reasons = [None]*(n_vars+1)
+
+        # assigned literals in order, with the trail position where each level starts
+        self.trail = []
+        self.level_start = []
+        # False once a node is added below the current top level
+        self.ordered = True
+        # trail position of the next literal to propagate
+        self.qhead = 0
+
+    @property
+    def graph(self):
+        return {
+            literal: [self.reasons[abs(literal)], self.levels[abs(literal)]]
+            for literal in self.trail
+        }
+
+    @property
+    def assigned_vars(self):
+        return list(self.trail)
+
+    def grow(self, n_vars):
+        extra = n_vars + 1 - len(self.values)
+        if extra > 0:
+            self.values += [0]*extra
+            self.levels += [-1]*extra
+            self.reasons += [None]*extra
+
     def add_node(self, literal, antecedent, decision_level):
-        assert literal not in self.assigned_vars
-        assert -literal not in self.assigned_vars
-        self.graph[literal] = [antecedent, decision_level]
-        self.assigned_vars = list(self.graph.keys())
+        var = abs(literal)
+        if var >= len(self.values):
+            self.grow(var)
+        assert self.values[var] == 0
+
+        self.values[var] = 1 if literal > 0 else -1
+        self.levels[var] = decision_level
+        self.reasons[var] = antecedent
+
+        self.push(literal, decision_level)
+
+    def unassign(self, literal):
+        var = abs(literal)
+        self.values[var] = 0
+        self.levels[var] = -1
+        self.reasons[var] = None
+
+    def push(self, literal, decision_level):
+        if len(self.level_start) == 0 or decision_level > self.level_start[-1][0]:
+            self.level_start.append((decision_level, len(self.trail)))
+        elif decision_level < self.level_start[-1][0]:
+            # the trail is no longer sorted by level, backtrack has to filter it
+            self.ordered = False
+
+        self.trail.append(literal)
+
+    def rebuild_levels(self):
+        trail = self.trail
+        self.trail = []
+        self.level_start = []
+        self.ordered = True
+        for literal in trail:
+            self.push(literal, self.levels[abs(literal)])
 
     def remove_node(self, literal):
-        if literal in self.graph.keys():
-            self.graph.pop(literal)
-        elif -literal in self.graph.keys():
-            self.graph.pop(-literal)
-        self.assigned_vars = list(self.graph.keys())
-        assert (literal not in self.graph.keys()) and (-literal not in self.graph.keys())
+        return self.remove_nodes([literal])
+
+    def remove_nodes(self, literals):
+        # unassigns a batch of literals anywhere in the trail: one pass and one level rebuild
+        # for the whole batch; RETURN : the unassigned literals
+        variables = {abs(xi) for xi in literals if abs(xi) < len(self.values) and self.values[abs(xi)] != 0}
+        if len(variables) == 0:
+            return []
+
+        removed = []
+        kept = []
+        qhead = 0
+        for i, literal in enumerate(self.trail):
+            if abs(literal) in variables:
+                self.unassign(literal)
+                removed.append(literal)
+            else:
+                kept.append(literal)
+                qhead += i < self.qhead
+        self.qhead = qhead
+        self.trail = kept
+        self.rebuild_levels()
+
+        return removed
 
     def backtrack(self, backtrack_level):
-        assigned_list = list(self.graph.keys())
-        for node in reversed(assigned_list):
-            if self.graph[node][1] > backtrack_level:
-                self.remove_node(node)
+        # RETURN : the unassigned literals
+
+        removed = []
+        if not self.ordered:
+            # out of order levels: keep every node up to backtrack_level
+            kept = []
+            qhead = 0
+            for i, literal in enumerate(self.trail):
+                if self.levels[abs(literal)] > backtrack_level:
+                    self.unassign(literal)
+                    removed.append(literal)
+                else:
+                    kept.append(literal)
+                    qhead += i < self.qhead
+            self.qhead = qhead
+            self.trail = kept
+            self.rebuild_levels()
+            return removed
 
-        list_lvl = [self.graph[item][1] for item in self.graph.keys()]
-        if len(list_lvl)>0:
-            assert max(list_lvl) <= backtrack_level
+        # pop the levels above backtrack_level from the top of the trail
+        while len(self.level_start) > 0 and self.level_start[-1][0] > backtrack_level:
+            _, start = self.level_start.pop()
+            for literal in self.trail[start:]:
+                self.unassign(literal)
+            removed += self.trail[start:]
+            del self.trail[start:]
+        self.qhead = min(self.qhead, len(self.trail))
+
+        return removed
+
+    def value(self, literal):
+        # 1 = TRUE, -1 = FALSE, 0 = UNASSIGNED
+        var = abs(literal)
+        if var >= len(self.values):
+            return 0
+        return self.values[var] if literal > 0 else -self.values[var]
+
+    def level(self, literal):
+        var = abs(literal)
+        if var >= len(self.values):
+            return -1
+        return self.levels[var]
 
     def get_antecedent(self, literal):
-        if  literal in self.graph.keys():
-            return self.graph[literal][0]
+        if self.value(literal) == 1:
+            return self.reasons[abs(literal)]
         else:
-            return None
\ No newline at end of file
+            return None
+
+    def n_vars(self):
+        return len(self.values) - 1
+
+    def n_assigned(self):
+        return len(self.trail)
\ No newline at end of file
@@ -1,97 +1,331 @@
 import numpy as np
 import time
-from satlp.boolean_solver import Clause, Formula, ImplicationGraph
+from collections import Counter
+from bisect import bisect_left
+from satlp.boolean_solver import Clause, Formula, ImplicationGraph, VSIDS, restart_policy
 from satlp.cnf_loader import CNFLoader
 
 class BooleanSolver: 
-    def __init__(self, filename, verbose, cnf_handler=None):
+    def __init__(self, filename, verbose, cnf_handler=None, heuristic='frequency', restarts='fixed', phase_saving=None, cache_dir=None):
         self.verbose = verbose
-        self.cnf_handler = cnf_handler if cnf_handler is not None else CNFLoader(filename)
+        self.cnf_handler = cnf_handler if cnf_handler is not None else CNFLoader(filename, cache_dir=cache_dir)
         self.nvars = self.cnf_handler.n_vars
-        self.formula = Formula(self.cnf_handler.clauses)
-        self.graph = ImplicationGraph()
+        literals, offsets = self.cnf_handler.clause_arrays()
+        self.formula = Formula(literals=literals, offsets=offsets)
+        self.graph = ImplicationGraph(self.nvars)
         self.decision_level = 0
-        self.nb_clauses = len(self.cnf_handler.clauses)
+        self.nb_clauses = self.cnf_handler.m_clauses
         self.nb_learnt_clause = 0
         self.nb_decisions = 0
         self.restart_count = 0
         self.conflict_count = 0
         self.analysis_count = 0
         self.restart_rate = 100
+        # restart schedule: 'fixed', 'luby', 'geometric' or 'glucose' (see restart_policy)
+        self.restarts = restart_policy(restarts, self.restart_rate)
+
+        # learnt clause database reduction every reduce_interval learnt clauses,
+        # the interval grows by reduce_increment after each reduction
+        self.reduce_interval = 2000
+        self.reduce_increment = 300
+        self.next_reduce = self.reduce_interval
+        # the detached antecedents of propagate_linear are collected once there are
+        # next_collect of them, then twice as many as the ones still in use
+        self.next_collect = self.reduce_interval
+
+        # clauses of cnf_handler already in the formula: the first synced ones, plus the
+        # learnt clauses not yet added to cnf_handler by the caller
+        self.synced = self.cnf_handler.m_clauses
+        self.unsynced = Counter()
+        # clauses appended to cnf_handler since the last sync (see clauses_added)
+        self.pending = False
+        self.cnf_handler.attach(self)
+        # level 0 holds fixings from a linear solution (not implied by the clauses)
+        self.fixed = False
         self.is_sat = 0 
         self.conflict = None
         self.history = []
 
+        # branching rule: 'frequency' = most frequent literal, 'vsids' = most active variable;
+        # phase saving (VSIDS only, on by default with it): a decision reuses the last polarity
+        # of its variable
+        if phase_saving is None:
+            phase_saving = heuristic == 'vsids'
+        if phase_saving and heuristic != 'vsids':
+            raise ValueError(f"Phase saving needs heuristic='vsids', got '{heuristic}'")
+        self.heuristic = heuristic
+        self.vsids = self.init_vsids(phase_saving) if heuristic == 'vsids' else None
+
     def witness_to_linear(self, witness):
         witness = sorted(witness, key=abs)
         solution = [1 if xi > 0 else 0 for xi in witness]
 
         return solution
 
-    def restart(self):
-        self.formula = Formula(self.cnf_handler.clauses)
-        self.graph = ImplicationGraph()
-        self.decision_level = 0
+    def restart(self, keep_root=True):
+        # backtrack to level 0, the clause database and its watches are kept; fixings, an
+        # out of order trail or keep_root=False clear level 0 too, its implications are propagated again
+        self.sync_clauses()
+        if self.fixed or not self.graph.ordered or not keep_root:
+            self.backtrack(-1)
+            self.formula.clear()
+            self.fixed = False
+        else:
+            self.backtrack(0)
         self.restart_count += 1
         self.conflict_count = 0
         self.is_sat = 0
         self.conflict = None
-            
+        self.restarts.on_restart()
+
+    def learn(self, learnt_clause):
+        # RETURN : the index of the clause in the formula
+        self.unsynced[tuple(learnt_clause.clause)] += 1
+        self.nb_learnt_clause += 1
+        return self.formula.add_clause(learnt_clause)
+
+    def forget(self, clauses):
+        # learnt clauses the caller did not append to cnf_handler (already there): sync_clauses
+        # no longer waits for them
+        for clause in clauses:
+            key = tuple(clause)
+            if self.unsynced[key] > 0:
+                self.unsynced[key] -= 1
+                if self.unsynced[key] == 0:
+                    del self.unsynced[key]
+
+    def clauses_added(self, start, stop):
+        # notified by cnf_handler: the new clauses join the formula at the next restart, or
+        # when solve is called again; their new variables join the search now
+        self.pending = True
+        if self.cnf_handler.n_vars > self.nvars:
+            self.grow(self.cnf_handler.n_vars)
+
+    def grow(self, n_vars):
+        # variables 1..n_vars, the new ones unassigned
+        self.graph.grow(n_vars)
+        if self.vsids is not None:
+            self.vsids.grow(n_vars)
+        self.nvars = n_vars
+
+    def sync_clauses(self):
+        # add the clauses appended to cnf_handler by someone else since the last sync, the
+        # ones not flagged learnt there (encoders, probing) have to be satisfied by a model
+        learnt_rows = self.cnf_handler.learnt_rows
+        learnt = set(learnt_rows[bisect_left(learnt_rows, self.synced):])
+        for row, clause in enumerate(self.cnf_handler.iter_clauses(self.synced), start=self.synced):
+            key = tuple(clause)
+            if self.unsynced[key] > 0:
+                self.unsynced[key] -= 1
+                if self.unsynced[key] == 0:
+                    del self.unsynced[key]
+            else:
+                self.formula.add_clause(Clause(list(clause)), learnt=False, required=row not in learnt)
+        self.synced = self.cnf_handler.m_clauses
+        self.pending = False
+
+    def init_vsids(self, phase_saving=True):
+
+        # initial activities and phases from the literal occurrences, below a single bump
+        literals, _ = self.cnf_handler.clause_arrays()
+        counts = np.bincount(literals.astype(np.int64) + self.nvars, minlength=2*self.nvars+1)
+
+        pos = counts[self.nvars+1:]
+        neg = counts[self.nvars-1::-1]
+        total = pos + neg
+        activity = np.concatenate([[0.0], total/(total.max() + 1 if len(total) > 0 else 1)])
+        phase = np.concatenate([[False], pos >= neg])
+
+        return VSIDS(self.nvars, activity=activity.tolist(), phase=phase.tolist(), saving=phase_saving)
+
+    def backtrack(self, backtrack_level):
+        removed = self.graph.backtrack(backtrack_level)
+        self.formula.backtrack(backtrack_level, self.graph, removed)
+        # implied literals are labeled with the level they are propagated at
+        self.decision_level = max(backtrack_level, 0)
+        if self.vsids is not None:
+            self.vsids.reinsert(removed)
+
+    def reduce_if_due(self):
+        # every learn counts (search, linear propagation, cuts); called between conflicts only,
+        # as compact renumbers the clauses
+        if self.nb_learnt_clause >= self.next_reduce:
+            self.reduce_db()
+        elif len(self.formula.detached) >= self.next_collect:
+            self.formula.collect_detached(self.graph)
+            self.next_collect = max(self.reduce_interval, 2*len(self.formula.detached))
+
+    def reduce_db(self):
+        self.formula.reduce_db(self.graph)
+        self.reduce_interval += self.reduce_increment
+        self.next_reduce += self.reduce_interval
+
     def conflict_analysis(self, conflict_clause): 
         # RETURN : learnt clause, and backtrack_level
-        w = conflict_clause
-        pool_literal = w.clause
-        i = 0
-        while i < len(pool_literal):
-            conflict_literal = pool_literal[i]
+        graph = self.graph
+        conflict_lits = self.formula.literals(conflict_clause)
+        conflict_level = max(graph.level(xi) for xi in conflict_lits)
+
+        # at level 0 only fixings can be blamed: resolve down to them
+        if conflict_level <= 0:
+            return self.resolve_to_decisions(conflict_lits)
+
+        # first UIP: resolve the conflict level literals backwards along the trail
+        # seen[var] = 1 for the literals of the learnt clause
+        seen = bytearray(max(self.nvars, graph.n_vars()) + 1)
+        bumped = []
+        learnt = [None]
+        path = 0
+        trail = graph.trail
+        idx = len(trail) - 1
+        p = None
+        reason = conflict_lits
+        while True:
+            for q in reason:
+                var = abs(q)
+                if seen[var] or (p is not None and var == abs(p)):
+                    continue
+                seen[var] = 1
+                bumped.append(var)
+                if graph.level(q) == conflict_level:
+                    path += 1
+                else:
+                    learnt.append(q)
+
+            # next literal of the conflict level on the trail
+            while idx >= 0 and not (seen[abs(trail[idx])] and graph.level(trail[idx]) == conflict_level):
+                idx -= 1
+            if idx < 0:
+                break
+            p = trail[idx]
+            idx -= 1
+            path -= 1
+
+            antecedent = graph.get_antecedent(p)
+            if path == 0:
+                learnt[0] = -p
+                break
+            elif antecedent is None:
+                # another decision/fixing of the same level, it stays in the clause
+                learnt.append(-p)
+                reason = []
+            else:
+                seen[abs(p)] = 0
+                reason = self.formula.literals(antecedent)
+                self.formula.bump_clause(antecedent)
+
+        if learnt[0] is None:
+            learnt = learnt[1:]
+
+        if self.vsids is not None:
+            self.vsids.bump(bumped)
+            self.vsids.decay_activity()
+        self.formula.bump_clause(conflict_clause)
+        self.formula.decay_clause_activity()
+
+        # drop the literals implied by the rest of the clause
+        learnt = learnt[:1] + [xi for xi in learnt[1:] if not self.lit_redundant(xi, seen)]
+
+        # UIP first, then the highest decision level, so the clause watches its last two levels
+        learnt = learnt[:1] + sorted(learnt[1:], key=lambda xi: graph.level(xi), reverse=True)
+        levels = [graph.level(xi) for xi in learnt[1:]]
+        if len(levels) == 0:
+            backtrack_level = 0
+        elif max(levels) >= conflict_level:
+            backtrack_level = conflict_level - 1
+        else:
+            backtrack_level = max(levels)
+
+        lbd = len({graph.level(xi) for xi in learnt})
+
+        return Clause(learnt, lbd=lbd), backtrack_level
+
+    def lit_redundant(self, literal, seen):
+
+        # literal is redundant if its antecedents lead only to clause literals (seen = 1)
+        # or to literals already proved redundant (seen = 2); failures are marked with 3
+        graph = self.graph
+        if graph.get_antecedent(-literal) is None:
+            return False
+
+        stack = [-literal]
+        visited = []
+        while len(stack) > 0:
+            p = stack.pop()
+            for q in self.formula.literals(graph.get_antecedent(p)):
+                var = abs(q)
+                if var == abs(p) or seen[var] == 1 or seen[var] == 2:
+                    continue
+                if seen[var] == 3 or graph.get_antecedent(-q) is None:
+                    for v in visited:
+                        seen[v] = 0
+                    seen[var] = 3
+                    return False
+                seen[var] = 2
+                visited.append(var)
+                stack.append(-q)
+
+        return True
+
+    def resolve_to_decisions(self, conflict_lits):
+        # resolve the conflict with the antecedents until only decisions/fixings remain
+        learnt = []
+        seen = set()
+        stack = list(conflict_lits)
+        while len(stack) > 0:
+            conflict_literal = stack.pop()
+            if abs(conflict_literal) in seen:
+                continue
+            seen.add(abs(conflict_literal))
+
             antecedent = self.graph.get_antecedent(-conflict_literal)
-            i += 1
+            if antecedent is None:
+                learnt.append(conflict_literal)
+            else:
+                stack += [xi for xi in self.formula.literals(antecedent) if abs(xi) not in seen]
+
+        if self.vsids is not None:
+            self.vsids.bump(seen)
+            self.vsids.decay_activity()
 
-            if antecedent is not None:
-                w = w.resolution_operate(antecedent, conflict_literal)
-                if w is None:
-                    return None, -1
+        if len(learnt) == 0:
+            return None, -1
 
-                pool_literal = w.clause
-                i = 0
+        # highest decision level first, so the learnt clause watches its last two levels
+        learnt.sort(key=lambda xi: self.graph.level(xi), reverse=True)
+        levels = sorted({self.graph.level(xi) for xi in learnt}, reverse=True)
+        backtrack_level = levels[1] if len(levels) > 1 else levels[0] - 1
 
-        return w, w.get_backtrack_level()
+        return Clause(learnt, lbd=len(levels)), backtrack_level
     
     def pick_branching_variable(self, exclude=[]):
 
+        if self.vsids is not None:
+            decision = self.vsids.pick(self.graph, exclude)
+            assert decision is not None
+            return decision
+
         ## Most frequent var first
-        counter = {}
-        for clause in self.formula.formula:
-            for literal in clause.clause[:clause.size]:
-                if literal not in exclude and -literal not in exclude:
-                    if literal in counter:
-                        counter[literal] += 1
-                    else:
-                        counter[literal] = 1 
+        counter = self.formula.get_counter(self.graph, exclude)
 
         assert len(counter) > 0
 
-        pool_literal = list(counter.keys())
-        decision = -1
-        i = 0
-        while i < len(pool_literal):
-            decision = pool_literal[i]
-            if decision not in self.graph.assigned_vars and -decision not in self.graph.assigned_vars:
-                break
-            i += 1
+        decision = next(iter(counter))
 
-        assert decision not in self.graph.assigned_vars
-        assert -decision not in self.graph.assigned_vars
+        assert self.graph.value(decision) == 0
         # decision = -decision if np.random.uniform(0, 1) >= 0.5 else decision
 
         return decision
 
     def is_all_assigned(self):
-        return self.nvars == len(self.graph.assigned_vars)
+        return self.nvars == self.graph.n_assigned()
 
     def solve(self): 
         stop = False
         initial_time = time.time()
+        # clauses added since the last call: the search restarts with them (level 0 is kept)
+        if self.pending:
+            self.restart()
         self.is_sat, self.conflict =  self.formula.unit_propagate(self.decision_level, self.graph)
         if self.verbose:
             print('=====================[  Search Statistics ]=====================')
@@ -101,6 +335,8 @@ class BooleanSolver:
             assert self.conflict is None
             assert not self.is_all_assigned() 
 
+            self.reduce_if_due()
+
             decision = self.pick_branching_variable()
             self.nb_decisions += 1
             self.decision_level += 1
@@ -131,20 +367,19 @@ class BooleanSolver:
                     self.is_sat = -1 
                     stop = True
                 else:
-                    self.formula.add_clause(learnt_clause)
-                    self.cnf_handler.add_clause(learnt_clause.clause)
-                    self.nb_learnt_clause += 1
-                    self.graph.backtrack(backtrack_level)
-                    self.formula.backtrack(backtrack_level, self.graph)
-                    self.decision_level = backtrack_level
+                    self.learn(learnt_clause)
+                    self.cnf_handler.add_clause(learnt_clause.clause, learnt=True)
+                    self.restarts.on_conflict(learnt_clause.lbd)
+                    self.backtrack(backtrack_level)
                     self.is_sat, self.conflict = self.formula.unit_propagate(self.decision_level, self.graph)
                     if self.is_sat == 0: 
                         assert not self.is_all_assigned()
 
-                ## If too much conflicts, RESTART IT NOW !
                 self.conflict_count += 1
-                if self.conflict_count > self.restart_rate:
-                    self.restart()
+
+            # restart once the conflicts are resolved, level 0 is then fully propagated
+            if self.is_sat == 0 and self.restarts.should_restart():
+                self.restart()
 
         assert self.is_sat != 0
         assert self.is_sat == self.formula.get_value()
@@ -174,40 +409,37 @@ class BooleanSolver:
         # solution was found without assigning all variable
         if len(witness) < self.nvars:
             for xi in range(1, self.nvars+1):
-                if xi not in witness and -xi not in witness:
+                if self.graph.value(xi) == 0:
                     witness.append(xi)
 
         return witness    
 
     def propagate_linear(self, linear_sol):
 
+        self.reduce_if_due()
         self.is_sat, self.conflict =  self.formula.unit_propagate(self.decision_level, self.graph)
         self.fix_variables(linear_sol)
         self.is_sat, self.conflict = self.formula.unit_propagate(1, self.graph)
         self.decision_level += 1
-        conflict = None
-        learnt_clause = None
-        m_simpl = -1
-        m_clauses = len(self.formula.formula)
-        while m_simpl < m_clauses:
-
-            # simplify all possible clauses by deduction ([~p, q], [p, q] -> q)
-            m_simpl = 0
-            for i in range(m_clauses):
-                c = self.formula.formula[i]
-                if c.size == 2:
-                    inf, clause = self.formula.simplify_pair(i, self.graph, self.decision_level)
-                    if inf is not None and clause is not None:
-                        self.graph.add_node(inf, clause, self.decision_level)
-                        self.is_sat, self.conflict = self.formula.bcp(inf, self.decision_level, self.graph)
-                        if self.is_sat == -1:
-                            break
-                m_simpl += 1
+        new_clauses = []
+        while True:
+
+            # simplify all possible clauses by deduction ([~p, q], [p, q] -> q), up to a fixpoint
+            n_inferred = 0
+            index = self.formula.binary_index(self.graph)
+            for pair, c in index.items():
+                inf, clause = self.formula.resolve_pair(pair, c, self.graph)
+                if inf is not None:
+                    self.graph.add_node(inf, clause, self.decision_level)
+                    self.is_sat, self.conflict = self.formula.bcp(inf, self.decision_level, self.graph)
+                    n_inferred += 1
+                    if self.is_sat == -1:
+                        break
 
             if self.is_sat == 0:
                 self.is_sat, self.conflict = self.formula.unit_propagate(self.decision_level, self.graph)
 
-            new_clauses = []
+            n_learnt = len(new_clauses)
             # solve conflict
             while self.is_sat == -1:
 
@@ -218,22 +450,27 @@ class BooleanSolver:
                     return None, None
                 
 
-                self.formula.add_clause(learnt_clause)
-                self.graph.backtrack(backtrack_level)
-                self.formula.backtrack(backtrack_level, self.graph)
+                self.learn(learnt_clause)
+                self.backtrack(backtrack_level)
 
-                for xi in learnt_clause.clause:
-                    self.formula.repair(-xi, self.graph)
-                    self.graph.remove_node(-xi)
+                removed = [-xi for xi in learnt_clause.clause if self.graph.value(-xi) == 1]
+                self.formula.undo(self.graph.remove_nodes(removed))
+                if self.vsids is not None:
+                    self.vsids.reinsert(removed)
+                self.formula.repair(self.graph)
 
                 new_clauses.append(learnt_clause.clause)
                 self.is_sat, self.conflict = self.formula.unit_propagate(self.decision_level, self.graph)
 
+            if n_inferred == 0 and len(new_clauses) == n_learnt:
+                break
+
         # return once there are no deductions to be made and all conflicts have been resolved
         return self.graph.assigned_vars, new_clauses
 
     def extend_solution(self):
         
+        self.reduce_if_due()
         new_clauses = []
         # assign variables to advance further in the problem (and generate conflicts)
         while self.is_sat == 0:
@@ -251,9 +488,8 @@ class BooleanSolver:
             if learnt_clause is None:
                 return None, None
 
-            self.formula.add_clause(learnt_clause)
-            self.graph.backtrack(backtrack_level)
-            self.formula.backtrack(backtrack_level, self.graph)
+            self.learn(learnt_clause)
+            self.backtrack(backtrack_level)
             new_clauses.append(learnt_clause.clause)
 
             self.is_sat, self.conflict = self.formula.unit_propagate(self.decision_level, self.graph)
@@ -261,23 +497,77 @@ class BooleanSolver:
         return self.graph.assigned_vars, new_clauses
 
     def pick_sat_var(self, clause):
-        lit_pool = clause.clause[:clause.size]
+        lit_pool = self.formula.remaining(clause, self.graph)
         
         return lit_pool
         decision = np.random.choice(lit_pool, 1).item()
 
-        assert decision not in self.graph.assigned_vars
+        assert self.graph.value(decision) == 0
         return decision
 
+    def failed_literals(self, candidates=None):
+
+        # probes both literals of each unassigned variable at level 1: a literal whose propagation
+        # fails is false, the literals implied by both are true; they are learnt as unit clauses
+        # RETURN : the literals found at level 0, None if the formula is UNSAT
+        self.restart()
+        self.is_sat, self.conflict = self.formula.unit_propagate(0, self.graph)
+        if self.is_sat == -1:
+            return None
+
+        forced = []
+        candidates = range(1, self.nvars+1) if candidates is None else candidates
+        for var in candidates:
+            if self.graph.value(var) != 0:
+                continue
+
+            implied = []
+            failed = []
+            for literal in [var, -var]:
+                start = len(self.graph.trail)
+                self.decision_level = 1
+                self.graph.add_node(literal, None, 1)
+                value, _ = self.formula.bcp(literal, 1, self.graph)
+                failed.append(value == -1)
+                implied.append(set(self.graph.trail[start+1:]))
+                self.backtrack(0)
+
+            if all(failed):
+                return None
+            elif failed[0] or failed[1]:
+                units = [-var] if failed[0] else [var]
+            else:
+                units = sorted(implied[0] & implied[1], key=abs)
+
+            for xi in units:
+                self.learn(Clause([xi]))
+            forced += units
+            self.is_sat, self.conflict = self.formula.unit_propagate(0, self.graph)
+            if self.is_sat == -1:
+                return None
+
+        # the forced literals are unit clauses now, the assignment is left empty
+        self.restart(keep_root=False)
+
+        return forced
+
     def fix_variables(self, linear_sol):
         
         for lit in linear_sol:
-            if lit not in self.graph.assigned_vars:
+            if self.graph.value(lit) == 0:
                 self.graph.add_node(lit, None, 0)
+                self.fixed = True
 
     def expand_and_learn(self, witness, decision):
-        
+
         self.restart()
+        self.reduce_if_due()
+        # decision already implied at level 0 by clauses the LP does not see (out of its learnt
+        # window): the unit clause is what it misses
+        root = self.graph.value(decision)
+        if root != 0:
+            return [(decision if root == 1 else -decision,)]
+
         self.fix_variables(witness)
 
         self.decision_level += 1
@@ -299,11 +589,10 @@ class BooleanSolver:
                 return None
 
             new_clauses.append(tuple(learnt_clause.clause))
-            self.formula.add_clause(learnt_clause)
-            self.graph.backtrack(backtrack_level)
-            self.formula.backtrack(backtrack_level, self.graph)
+            c = self.learn(learnt_clause)
+            self.backtrack(backtrack_level)
             
-            print(self.formula.formula[-1].print_info())
+            print(Clause(self.formula.literals(c)).print_info())
             
             self.is_sat, self.conflict = self.formula.unit_propagate(self.decision_level, self.graph)
 
@@ -311,6 +600,9 @@ class BooleanSolver:
         if len(new_clauses) == 0:
             breakpoint()
 
+        # leave no assignment behind for the branching rule used by weak projections
+        self.restart()
+
         return new_clauses
 
     def expand_and_learn2(self, witness, decision):
@@ -339,8 +631,7 @@ class BooleanSolver:
             # self.is_sat, self.conflict = self.formula.unit_propagate2(self.decision_level, self.graph)
 
         # backtrack new decisions and propagate new clauses
-        self.graph.backtrack(0)
-        self.formula.backtrack(0, self.graph)
+        self.backtrack(0)
         self.is_sat, self.conflict = self.formula.unit_propagate2(0, self.graph)
 
         # resolve conflicts from propagation
@@ -349,7 +640,7 @@ class BooleanSolver:
                 print(self.conflict)
                 conflict = self.conflict.pop()
                 learnt_clause, _ = self.conflict_analysis(conflict)
-                self.formula.add_clause(learnt_clause)
+                self.learn(learnt_clause)
                 new_clauses.append(tuple(learnt_clause.clause))
                 # self.is_sat, self.conflict = self.formula.unit_propagate2(0, self.graph)
 
@@ -1,42 +1,462 @@
 from numpy import array as np_array
 from numpy import append as np_append
+from itertools import chain
+from array import array
+from bisect import bisect_left
+import mmap
+import os
+import hashlib
+import gzip
+import bz2
+import lzma
+import numpy as np
+
+# magic bytes of the compressed formats -> module opening them as a stream
+COMPRESSED = [(b'\x1f\x8b', gzip), (b'BZh', bz2), (b'\xfd7zXZ\x00', lzma)]
+# decompressed bytes parsed at once
+CHUNK_SIZE = 1 << 24
+# bumped whenever the parsed form changes, the old cache files are then ignored
+CACHE_VERSION = b'satlp-cnf-1'
+
+def flatten_clauses(clauses):
+
+    # flat literal buffer + clause offsets (clause i = literals[offsets[i]:offsets[i+1]])
+    m_clauses = len(clauses)
+    lengths = np.fromiter((len(c) for c in clauses), dtype=np.int64, count=m_clauses)
+    offsets = np.zeros(m_clauses + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    literals = np.fromiter(chain.from_iterable(clauses), dtype=np.int32, count=offsets[-1])
+
+    return literals, offsets
+
+def strip_lines(body):
+
+    # drops the comment lines and the '%' end marker of the SATLIB files (lines starting with
+    # c or %), the 0 that follows the marker only closes an empty clause
+    buf = np.frombuffer(body, dtype=np.uint8)
+    starts = np.concatenate([[0], np.flatnonzero(buf == ord('\n')) + 1])
+    starts = starts[starts < len(buf)]
+    first = buf[starts]
+    drop = (first == ord('c')) | (first == ord('%'))
+    if not np.any(drop):
+        return body
+
+    ends = np.append(starts[1:], len(buf))
+    keep = np.repeat(~drop, ends - starts)
+    return buf[keep].tobytes()
+
+def count_fields(body):
+    # RETURN : number of whitespace separated fields of body (bytes up to ' ' separate them)
+    space = np.frombuffer(body, dtype=np.uint8) <= ord(' ')
+    if len(space) == 0:
+        return 0
+    return int(not space[0]) + int(np.count_nonzero(space[1:] < space[:-1]))
+
+def tokenize(body):
+
+    # RETURN : the integers of body (whole lines); fromstring stops at a malformed token (or
+    # reads '- 2' as one), so the count is checked against the fields, and out of range
+    # literals against int32
+    body = strip_lines(body)
+    n_fields = count_fields(body)
+    if n_fields == 0:
+        return np.zeros(0, dtype=np.int32)
+
+    tokens = np.fromstring(body, dtype=np.int64, sep=' ')
+    if len(tokens) != n_fields:
+        raise ValueError(f"malformed token in the clauses: {len(tokens)} integers read out of {n_fields} fields")
+    limit = np.iinfo(np.int32).max
+    if tokens.min() < -limit or tokens.max() > limit:
+        raise ValueError("literal out of the int32 range in the clauses")
+    return tokens.astype(np.int32)
+
+def split_tokens(tokens):
+
+    # 0 terminated clauses (the last one may miss its 0), empty clauses are skipped
+    # RETURN : literals, offsets
+    tokens = np.asarray(tokens)
+    ends = np.flatnonzero(tokens == 0)
+    if len(tokens) > 0 and tokens[-1] != 0:
+        ends = np.append(ends, len(tokens))
+    lengths = np.diff(np.concatenate([[-1], ends])) - 1
+    lengths = lengths[lengths > 0]
+
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    return tokens[tokens != 0].astype(np.int32), offsets
+
+def build_clauses(tokens):
+
+    # RETURN : literals of the clauses sorted on the variable, offsets
+    literals, offsets = split_tokens(tokens)
+    rows = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    # one stable sort on (clause, variable), the clauses stay in place
+    variables = np.abs(literals).astype(np.int64)
+    width = variables.max() + 1 if len(variables) > 0 else 1
+    order = np.argsort(rows*width + variables, kind='stable')
+
+    return literals[order], offsets
+
+def read_header(stream):
+    # skips the comments up to the header p cnf <n_vars> <m_clauses>; RETURN : n_vars
+    line = stream.readline()
+    while line and not line.startswith(b'p'):
+        line = stream.readline()
+    return int(line.split()[-2])
+
+def compression(filename):
+    # RETURN : the module decompressing the file (by its magic bytes), None for plain text
+    with open(filename, 'rb') as f:
+        magic = f.read(6)
+    for prefix, module in COMPRESSED:
+        if magic.startswith(prefix):
+            return module
+    return None
+
+def read_chunks(stream):
+
+    # tokens of a stream read CHUNK_SIZE bytes at a time, each chunk cut after its last
+    # newline so that no line (or number) is split, the rest is carried over
+    chunks = []
+    rest = b''
+    while True:
+        data = stream.read(CHUNK_SIZE)
+        if not data:
+            break
+        data = rest + data
+        cut = data.rfind(b'\n') + 1
+        rest = data[cut:]
+        chunks.append(tokenize(data[:cut]))
+    chunks.append(tokenize(rest))
+
+    return np.concatenate(chunks)
+
+def content_hash(filename):
+    # RETURN : hex digest of the file bytes (as stored, compressed or not)
+    digest = hashlib.blake2b(CACHE_VERSION, digest_size=16)
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def write_cache(path, n_vars, literals, offsets):
+
+    # int64 header (n_vars, m_clauses, n_literals), int64 offsets, int32 literals; written
+    # to a temporary file first so that a concurrent reader never sees a partial file
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        np.array([n_vars, len(offsets) - 1, len(literals)], dtype=np.int64).tofile(f)
+        np.asarray(offsets, dtype=np.int64).tofile(f)
+        np.asarray(literals, dtype=np.int32).tofile(f)
+    os.replace(tmp, path)
+
+def read_cache(path):
+
+    # RETURN : (n_vars, literals, offsets) memory-mapped from the cache file, None if there
+    # is no valid one
+    if not os.path.exists(path):
+        return None
+    header = np.fromfile(path, dtype=np.int64, count=3)
+    if len(header) < 3:
+        return None
+    n_vars, m_clauses, n_literals = header.tolist()
+    if os.path.getsize(path) != 24 + 8*(m_clauses + 1) + 4*n_literals:
+        return None
+
+    offsets = np.memmap(path, dtype=np.int64, mode='r', offset=24, shape=(m_clauses + 1,))
+    literals = np.memmap(path, dtype=np.int32, mode='r', offset=24 + 8*(m_clauses + 1), shape=(n_literals,))
+
+    return n_vars, literals, offsets
 
 class CNFLoader():
 
-    def __init__(self, filename=None):
+    def __init__(self, filename=None, cache_dir=None):
+        self.filename = None
         self.n_vars = None
         self.m_clauses = None
-        self.clauses = None
-        self.learnt_clauses = 0
+        self.reset_learnts()
+
+        # the clauses as a flat int32 literal buffer + int64 offsets (clause i =
+        # literals[offsets[i]:offsets[i+1]]), grown by doubling; the list of lists behind
+        # clauses is built on first use and kept in step afterwards
+        self._literals = None
+        self._offsets = None
+        self.n_literals = 0
+        self._clauses = None
+
+        # objects with a clauses_added(start, stop) method, called after rows start..stop-1
+        # are appended
+        self.listeners = []
+
+        # parsed formulas kept in cache_dir under the hash of the file content
+        self.cache_dir = cache_dir
         if filename:
             self._load_from_file(filename)
 
+    def reset_learnts(self):
+        self.learnt_clauses = 0
+        # indices in clauses of the learnt ones, in the order they were added, the clock time
+        # each one was last learnt (same order) and the row of each learnt literal set
+        self.learnt_rows = []
+        self.learnt_used = []
+        self.learnt_index = {}
+        self.learnt_clock = 0
+        # learnt rows kept in the window of selected_rows whatever their age
+        self.pinned = set()
+
+    @property
+    def literals(self):
+        return None if self._literals is None else self._literals[:self.n_literals]
+
+    @property
+    def offsets(self):
+        return None if self._offsets is None else self._offsets[:self.m_clauses+1]
+
+    @property
+    def clauses(self):
+        if self._clauses is None and self._literals is not None:
+            self._clauses = list(self.iter_clauses())
+        return self._clauses
+
+    @clauses.setter
+    def clauses(self, clauses):
+        # clauses replaced from outside (preprocessing, components)
+        self.reset_learnts()
+        if clauses is None:
+            self._literals = self._offsets = self._clauses = None
+            self.n_literals = 0
+            self.m_clauses = None
+            return
+
+        literals, offsets = flatten_clauses(clauses)
+        self.set_flat(literals, offsets)
+        self._clauses = clauses
+
+    def iter_clauses(self, start=0, stop=None):
+        # RETURN : generator of the clauses start..stop-1 as lists
+        stop = self.m_clauses if stop is None else stop
+        if self._clauses is not None:
+            yield from self._clauses[start:stop]
+            return
+
+        bounds = self._offsets[start:stop+1].tolist()
+        literals = self._literals[bounds[0]:bounds[-1]].tolist()
+        base = bounds[0]
+        for i in range(len(bounds) - 1):
+            yield literals[bounds[i]-base:bounds[i+1]-base]
+
     def _load_from_file(self, filename):
 
-        with open(filename) as f:
-            # eliminate comments, last lines and empty lines
-            ignore_line = ['0', '%', 'c', '\n']
-            cnf_data = [line.rstrip() for line in f if line[0] not in ignore_line]
-            m_clauses = int(cnf_data[0].split()[-1])
-            n_variables = int(cnf_data[0].split()[-2])
-            clauses = [
-                sorted([int(i) for i in l.split()[:-1]], key=abs)
-                    for l in cnf_data[1:] if len(l) > 0
-            ]
+        self.filename = filename
+        path = None
+        if self.cache_dir is not None:
+            path = os.path.join(self.cache_dir, f"{content_hash(filename)}.cnf.bin")
+            cached = read_cache(path)
+            if cached is not None:
+                self.n_vars, literals, offsets = cached
+                self.set_flat(literals, offsets)
+                return
+
+        module = compression(filename)
+        if module is None:
+            with open(filename, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                n_variables = read_header(data)
+                tokens = tokenize(data[data.tell():])
+        else:
+            # decompressed on the fly, the whole text is never held in memory
+            with module.open(filename, 'rb') as stream:
+                n_variables = read_header(stream)
+                tokens = read_chunks(stream)
+        literals, offsets = build_clauses(tokens)
 
         self.n_vars = n_variables
-        self.m_clauses = len(clauses)
-        self.clauses = clauses
+        self.set_flat(literals, offsets)
+        if path is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            write_cache(path, n_variables, literals, offsets)
+
+    def set_flat(self, literals, offsets):
+        # the buffers are copied (and made writable) by reserve on the first append
+        self._clauses = None
+        self._literals = literals
+        self._offsets = offsets
+        self.n_literals = len(literals)
+        self.m_clauses = len(offsets) - 1
 
     def load(self, filename):
-        if (self.clauses == None) or (filename != self.filename):
+
+        # (re)loads the formula of filename, unless it is already the loaded one
+        # RETURN : the loader
+        if self.m_clauses is None or filename != self.filename:
             try:
+                self.reset_learnts()
                 self._load_from_file(filename)
-            except FileError:
+            except (OSError, ValueError, IndexError):
                 print("Something went wrong loading the file. Make sure it is in DIMCAS formats.")
 
-        return inf_assignments        
+        return self
+
+    def attach(self, listener):
+        self.listeners.append(listener)
+
+    def detach(self, listener):
+        self.listeners.remove(listener)
+
+    def reserve(self, n_literals, n_clauses):
+
+        # room for n_literals / n_clauses more, the buffers at least double when they grow
+        # (amortized O(1) per literal)
+        m_clauses = 0 if self.m_clauses is None else self.m_clauses
+        needed = self.n_literals + n_literals
+        if self._literals is None or len(self._literals) < needed:
+            size = 0 if self._literals is None else len(self._literals)
+            literals = np.empty(max(needed, 2*size, 16), dtype=np.int32)
+            if self._literals is not None:
+                literals[:self.n_literals] = self._literals[:self.n_literals]
+            self._literals = literals
+
+        needed = m_clauses + 1 + n_clauses
+        if self._offsets is None or len(self._offsets) < needed:
+            size = 0 if self._offsets is None else len(self._offsets)
+            offsets = np.zeros(max(needed, 2*size, 16), dtype=np.int64)
+            if self._offsets is not None:
+                offsets[:m_clauses+1] = self._offsets[:m_clauses+1]
+            self._offsets = offsets
+
+    def add_flat(self, literals, offsets, learnt=False):
+
+        # appends the clauses literals[offsets[i]:offsets[i+1]] (kept as given, not sorted)
+        # RETURN : the rows of the new clauses
+        literals = np.asarray(literals, dtype=np.int32)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        start = 0 if self.m_clauses is None else self.m_clauses
+        n_new = len(offsets) - 1
+        self.reserve(len(literals), n_new)
+
+        self._literals[self.n_literals:self.n_literals+len(literals)] = literals
+        self._offsets[start+1:start+n_new+1] = self.n_literals + offsets[1:] - offsets[0]
+        if self._clauses is not None:
+            literals_list = literals.tolist()
+            bounds = (offsets - offsets[0]).tolist()
+            self._clauses.extend(literals_list[bounds[i]:bounds[i+1]] for i in range(n_new))
+
+        self.n_literals += len(literals)
+        self.m_clauses = start + n_new
+        if len(literals) > 0:
+            self.n_vars = max(self.n_vars or 0, int(np.abs(literals).max()))
+        if learnt:
+            self.learnt_rows.extend(range(start, start + n_new))
+            self.learnt_used.extend(range(self.learnt_clock, self.learnt_clock + n_new))
+            self.learnt_clock += n_new
+            self.learnt_clauses += n_new
+            literals_list = literals.tolist()
+            bounds = (offsets - offsets[0]).tolist()
+            for i in range(n_new):
+                self.learnt_index.setdefault(tuple(sorted(literals_list[bounds[i]:bounds[i+1]])), start + i)
+
+        for listener in self.listeners:
+            listener.clauses_added(start, start + n_new)
+
+        return np.arange(start, start + n_new)
+
+    def add_clause(self, clause, learnt=False):
+        self.add_flat(clause, [0, len(clause)], learnt=learnt)
+
+    def add_clauses(self, clauses, learnt=False):
+
+        # bulk append, a single notification: clauses is a 2D array (one clause per row, 0
+        # entries pad the short ones), a 1D array of 0 terminated clauses (DIMACS order),
+        # or any iterable of clauses (read once, generators included)
+        # RETURN : the rows of the new clauses
+        if isinstance(clauses, np.ndarray) and clauses.ndim == 2:
+            mask = clauses != 0
+            lengths = mask.sum(axis=1)
+            literals = clauses[mask]
+            offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=offsets[1:])
+        elif isinstance(clauses, np.ndarray):
+            literals, offsets = split_tokens(clauses)
+        else:
+            literals = array('i')
+            offsets = array('q', [0])
+            for c in clauses:
+                literals.extend(c)
+                offsets.append(len(literals))
+            literals = np.frombuffer(literals, dtype=np.int32)
+            offsets = np.frombuffer(offsets, dtype=np.int64)
+
+        return self.add_flat(literals, offsets, learnt=learnt)
+
+    def add_learnts(self, clauses):
+
+        # learnt clauses, each one appended once: a clause learnt again is stamped as just
+        # learnt instead, which brings it back into the window of selected_rows
+        # RETURN : the appended clauses
+        new = []
+        keys = set()
+        for c in clauses:
+            key = tuple(sorted(c))
+            row = self.learnt_index.get(key)
+            if row is not None:
+                self.learnt_used[bisect_left(self.learnt_rows, row)] = self.learnt_clock
+                self.learnt_clock += 1
+            elif key not in keys:
+                keys.add(key)
+                new.append(c)
+        if len(new) > 0:
+            self.add_clauses(new, learnt=True)
+
+        return new
+
+    def learnt_row(self, clause):
+        # RETURN : the row of the learnt clause (same literal set), None if it was not learnt
+        return self.learnt_index.get(tuple(sorted(clause)))
+
+    def pin(self, rows):
+        # the learnt rows stay in the window of selected_rows, the clock moves so that the
+        # window is selected again; RETURN : the number of rows newly pinned
+        new = set(rows) - self.pinned
+        if len(new) > 0:
+            self.pinned |= new
+            self.learnt_clock += 1
+
+        return len(new)
+
+    def clause_arrays(self, rows=None):
+
+        # RETURN : (literals, offsets) of the clauses in rows (all by default)
+        if rows is None:
+            return self.literals, self.offsets
+
+        rows = np.asarray(rows, dtype=np.int64)
+        starts = self._offsets[rows]
+        lengths = self._offsets[rows+1] - starts
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        index = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+
+        return self._literals[index], offsets
+
+    def selected_rows(self, max_learnts=None, keep_length=2):
+
+        # indices of the original clauses, of the learnt ones with at most keep_length literals
+        # (units and binaries stay), of the pinned ones and of the max_learnts most recently
+        # learnt other ones
+        rows = np.arange(self.m_clauses)
+        if max_learnts is None or len(self.learnt_rows) <= max_learnts:
+            return rows
+
+        learnt = np.array(self.learnt_rows, dtype=np.int64)
+        long = self._offsets[learnt+1] - self._offsets[learnt] > keep_length
+        if len(self.pinned) > 0:
+            long &= ~np.isin(learnt, list(self.pinned))
+        n_old = int(np.sum(long)) - max_learnts
+        if n_old <= 0:
+            return rows
+
+        order = np.argsort(np.array(self.learnt_used)[long], kind='stable')
+        keep = np.ones(self.m_clauses, dtype=bool)
+        keep[learnt[long][order[:n_old]]] = False
 
-    def add_clause(self, clause):
-        self.clauses.append(clause)
-        self.m_clauses += 1
\ No newline at end of file
+        return rows[keep]
\ No newline at end of file
@@ -1 +1,2 @@
-from satlp.hyb_solver.hyb_solver import HybridSolver
\ No newline at end of file
+from satlp.hyb_solver.hyb_solver import HybridSolver
+from satlp.hyb_solver.probing import lp_backbone
\ No newline at end of file
@@ -5,6 +5,10 @@ from satlp.linear_solver import (
 )
 from satlp.boolean_solver import BooleanSolver
 from satlp.cnf_loader import CNFLoader
+from satlp.preprocessing import Preprocessor, split_formula, residual_formula
+from satlp.linear_solver.clause_matrix import apply_fixing, unit_propagate
+from satlp.hyb_solver.probing import lp_backbone
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 
 class HybridSolver:
@@ -15,16 +19,74 @@ class HybridSolver:
         lp_solver,
         method='highs-ipm',
         solutions='',
+        backend='scipy',
+        lazy=False,
+        presolve=True,
+        heuristic='frequency',
+        restarts='fixed',
+        phase_saving=None,
+        lp_learnts=None,
+        preprocess=False,
+        probing=False,
+        decompose=False,
+        cnf_handler=None,
+        cache_dir=None,
     ):
         self.filename = filename
         self.fixing = {}
-        self.cnf_handler = CNFLoader(filename)
-        self.lp_solver = lp_solver(fixing=self.fixing, filename=filename, method=method, cnf_handler=self.cnf_handler)
-        self.bool_solver = BooleanSolver(filename, verbose=0, cnf_handler=self.cnf_handler)
+        self.cnf_handler = CNFLoader(filename, cache_dir=cache_dir) if cnf_handler is None else cnf_handler
+
+        # solver settings given to the solvers of the independent components
+        self.lp_solver_class = lp_solver
+        self.options = dict(
+            method=method,
+            backend=backend,
+            lazy=lazy,
+            presolve=presolve,
+            heuristic=heuristic,
+            restarts=restarts,
+            phase_saving=phase_saving,
+            lp_learnts=lp_learnts,
+        )
+
+        # both solvers work on the reduced formula, verify extends its witnesses back
+        self.preprocessor = None
+        if preprocess:
+            self.preprocessor = Preprocessor(self.cnf_handler.clauses, self.cnf_handler.n_vars)
+            self.preprocessor.apply(self.cnf_handler)
+        self.lp_solver = lp_solver(
+            fixing=self.fixing, 
+            filename=filename, 
+            method=method, 
+            cnf_handler=self.cnf_handler,
+            backend=backend,
+            lazy=lazy,
+            presolve=presolve,
+            lp_learnts=lp_learnts,
+        )
+        self.bool_solver = BooleanSolver(
+            filename, 
+            verbose=0, 
+            cnf_handler=self.cnf_handler, 
+            heuristic=heuristic,
+            restarts=restarts,
+            phase_saving=phase_saving,
+        )
         self.history = []
         self.linear_it = 0
         self.boolean_it = 0
         self.wp_it = 0
+        # optimize runs left to the boolean solver (see optimize)
+        self.boolean_fallbacks = 0
+
+        # probe for forced literals before the first cut / linear solve
+        self.probing = probing
+        self.probed = False
+
+        # once a fixing of the feasibility cut covers decompose_ratio of the variables, the
+        # residual formula is split and its components are solved on their own
+        self.decompose = decompose
+        self.decompose_ratio = 0.5
         
 
     def print_verbose(self, witness):
@@ -86,16 +148,73 @@ class HybridSolver:
             if new_clauses is None:
                 return None
 
-        for c in new_clauses:
-            self.cnf_handler.add_clause(c)
-            self.cnf_handler.learnt_clauses += 1
+        self.learn_clauses(new_clauses)
 
         self.bool_solver.restart()
 
         return resolved
 
+    def learn_clauses(self, clauses):
+        # learnt clauses go to cnf_handler once, a clause learnt again is moved back into the
+        # LP window instead; RETURN : the rows of the clauses in cnf_handler
+        new = self.cnf_handler.add_learnts(clauses)
+        if len(new) < len(clauses):
+            repeated = list(clauses)
+            for c in new:
+                repeated.remove(c)
+            self.bool_solver.forget(repeated)
+
+        rows = [self.cnf_handler.learnt_row(c) for c in clauses]
+        return [row for row in rows if row is not None]
+
+    def probe(self, lp=True, boolean=True, n_jobs=None, batch_size=16):
+
+        # literals with the same value in every solution, by failed literal probing and by
+        # min/max x_i over the LP relaxation, kept as unit clauses of the formula
+        # RETURN : the forced literals, None if the formula is UNSAT
+        self.probed = True
+        n_vars = self.cnf_handler.n_vars
+        forced = []
+        if boolean:
+            units = self.bool_solver.failed_literals()
+            if units is None:
+                return None
+            for xi in units:
+                self.cnf_handler.add_clause([xi])
+            forced += units
+
+        if lp:
+            A, A_csc, n_neg = self.lp_solver.base_model()
+            fixed, values = unit_propagate(A, A_csc, n_neg, np.zeros(n_vars, dtype=bool), np.zeros(n_vars))
+            if fixed is None:
+                return None
+
+            A_ub, y_ub = apply_fixing(A, A_csc, n_neg, fixed, values)
+            backbone = lp_backbone(
+                A_ub, 
+                y_ub, 
+                np.flatnonzero(~fixed), 
+                method=self.lp_solver.method, 
+                n_jobs=n_jobs, 
+                batch_size=batch_size,
+            )
+            if backbone is None:
+                return None
+
+            ones, zeros = backbone
+            units = [int(i)+1 for i in ones] + [-int(i)-1 for i in zeros]
+            for xi in units:
+                self.cnf_handler.add_clause([xi])
+            forced += units
+
+        print(f"PROBING FIXED {len(forced)} LITERALS")
+        return forced
+
     def solve(self):
 
+        if self.probing and not self.probed and self.probe() is None:
+            return None
+
         it = 0
         n_vars = self.cnf_handler.n_vars
         m_clauses = self.cnf_handler.m_clauses
@@ -252,6 +371,10 @@ class HybridSolver:
 
             _witness, _decision = self.weak_projection(current_fixing=fixing)
             self.wp_it += 1
+            # INFEASIBLE without fixing => UNSAT
+            if _witness is None and len(fixing) == 0:
+                return None, None
+
             _fixing = self.extract_fixing(_witness)
             print(f"TRIED WEAK BRANCHING ON COORDINATE {_decision}")
 
@@ -299,10 +422,26 @@ class HybridSolver:
             print(f"RUNNING FEASIBILITY WITH FIXING: {fixing}")
             witness, res = self.solve_linear(fixing=fixing, feas=True)
             self.linear_it += 1
+            # INFEASIBLE without fixing => UNSAT
+            if witness is None and len(fixing) == 0:
+                return None, None
+
             _fixing = self.extract_fixing(witness)
 
             if len(_fixing) == n_vars:
                 return _fixing, []
+
+            if self.decompose and len(_fixing) >= self.decompose_ratio*n_vars:
+                completed, learnt = self.complete_by_components(_fixing)
+                if completed is not None:
+                    return completed, []
+
+                if learnt is not None:
+                    # UNSAT component whatever the fixing => UNSAT
+                    if len(learnt) == 0:
+                        return None, None
+                    # the learnt clause rejects the fixing: the cut starts over
+                    return _fixing, []
                 
 
             if fixing == _fixing:
@@ -341,8 +480,16 @@ class HybridSolver:
 
     def optimize(self, generate_cut, track_history=False):
 
+        if self.probing and not self.probed and self.probe() is None:
+            return None
+
         n_vars = self.cnf_handler.n_vars
         fixing = {}
+        # cuts since the last new clause -> rows of the clauses learnt from them: a cut coming
+        # back means the LP window lost them, they are pinned in it; a cut coming back with
+        # them pinned is left to the boolean solver (counted in boolean_fallbacks)
+        seen = {}
+        m_clauses = self.cnf_handler.m_clauses
         while True:
 
             cut, conflicts = generate_cut()
@@ -350,9 +497,25 @@ class HybridSolver:
                 self.history.append(cut)
 
             # UNSAT
-            if len(cut) == 0:
+            if cut is None or len(cut) == 0:
                 return None
 
+            if self.cnf_handler.m_clauses > m_clauses:
+                seen.clear()
+                m_clauses = self.cnf_handler.m_clauses
+            key = frozenset(cut.items())
+            if key in seen:
+                n_pinned = self.cnf_handler.pin(set().union(*seen.values()))
+                if n_pinned > 0:
+                    print(f"SAME CUT AGAIN: {n_pinned} LEARNT CLAUSES PINNED IN THE LP WINDOW")
+                    seen.clear()
+                    continue
+
+                self.boolean_fallbacks += 1
+                print("SAME CUT AGAIN WITH ITS CLAUSES PINNED: FINISHING WITH THE BOOLEAN SOLVER")
+                return self.finish_boolean()
+            seen[key] = set()
+
             if len(cut) == n_vars:
                 witness = self.cut_to_linear(cut)
                 if self.lp_solver.verify(witness):
@@ -368,19 +531,129 @@ class HybridSolver:
                     if learned is None:
                         return None
 
-                    for c in learned:
-                        self.cnf_handler.add_clause(c)
-                        self.cnf_handler.learnt_clauses += 1
+                    seen[key].update(self.learn_clauses(learned))
                     
 
+    def finish_boolean(self):
+        # RETURN : the model of the boolean solver as a linear witness, None if UNSAT
+        self.bool_solver.restart()
+        model = self.bool_solver.solve()
+        if self.bool_solver.is_sat != 1:
+            return None
+
+        return self.cut_to_linear({abs(xi): 1 if xi > 0 else 0 for xi in model})
+
+    def split(self):
+        # RETURN : list of (var_map, clauses) of the independent components of the formula,
+        # None if it has an empty clause
+        return split_formula(self.cnf_handler.clauses, self.cnf_handler.n_vars)
+
+    def solve_components(self, parts, cut_name, n_jobs=None, min_parallel=200):
+
+        # components with at least min_parallel variables go to the process pool, the small
+        # ones are cheaper to solve here than to send
+        # RETURN : the 0/1 values of the variables of each component, None if one is UNSAT
+        tasks = [
+            (self.lp_solver_class, self.options, len(var_map), clauses, cut_name)
+            for var_map, clauses in parts
+        ]
+        large = [k for k, (var_map, _) in enumerate(parts) if len(var_map) >= min_parallel]
+        if n_jobs == 1 or len(large) <= 1:
+            large = []
+
+        results = [None]*len(tasks)
+        for k in range(len(tasks)):
+            if k in large:
+                continue
+            results[k] = solve_component(tasks[k])
+            # UNSAT component => UNSAT formula
+            if results[k] is None:
+                return None
+
+        if len(large) > 0:
+            with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+                for k, result in zip(large, pool.map(solve_component, [tasks[k] for k in large])):
+                    if result is None:
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        return None
+                    results[k] = result
+
+        return results
+
+    def optimize_components(self, generate_cut, n_jobs=None, min_parallel=200):
+
+        # the formula is split into components without shared variables, each one solved by its
+        # own hybrid solver with the same cut, and their witnesses merged
+        if self.probing and not self.probed and self.probe() is None:
+            return None
+
+        parts = self.split()
+        # empty clause => UNSAT
+        if parts is None:
+            return None
+        if len(parts) <= 1:
+            return self.optimize(generate_cut)
+
+        print(f"SOLVING {len(parts)} INDEPENDENT COMPONENTS")
+        results = self.solve_components(parts, generate_cut.__name__, n_jobs=n_jobs, min_parallel=min_parallel)
+        if results is None:
+            return None
+
+        # variables in no clause are free, set to 0
+        witness = np.zeros(self.cnf_handler.n_vars)
+        for (var_map, _), values in zip(parts, results):
+            witness[var_map-1] = values
+
+        return witness
+
+    def complete_by_components(self, fixing):
+
+        # the clauses left by the fixing are split and each component solved by feasibility
+        # cuts; a component with no solution rejects the fixing: the clauses touching it are
+        # falsified by their fixed literals, one of which has to flip (learnt clause)
+        # RETURN : (the fixing extended to all the variables, None) or (None, the learnt clause),
+        # (None, None) if the residual formula does not split
+        n_vars = self.cnf_handler.n_vars
+        clauses = self.cnf_handler.clauses
+        residual = residual_formula(clauses, fixing)
+        if residual is None:
+            return None, None
+
+        parts = split_formula(residual, n_vars)
+        if len(parts) <= 1:
+            return None, None
+
+        print(f"FIXING OF {len(fixing)} VARIABLES LEAVES {len(parts)} COMPONENTS")
+        completed = {i+1: fixing.get(i+1, 0) for i in range(n_vars)}
+        for var_map, part in sorted(parts, key=lambda p: len(p[0])):
+            values = solve_component((self.lp_solver_class, self.options, len(var_map), part, 'generate_feas_cut'))
+            if values is None:
+                component = set(var_map.tolist())
+                learnt = set()
+                for c in clauses:
+                    fixed = [xi for xi in c if abs(xi) in fixing]
+                    satisfied = any((fixing[abs(xi)] == 1) == (xi > 0) for xi in fixed)
+                    if not satisfied and len(fixed) < len(c) and any(abs(xi) in component for xi in c):
+                        learnt.update(fixed)
+                learnt = sorted(learnt, key=abs)
+                # implied by the formula: kept for good, out of reach of the lp_learnts window
+                if len(learnt) > 0:
+                    self.cnf_handler.add_clause(learnt, learnt=False)
+                return None, learnt
+
+            for var, value in zip(var_map, values):
+                completed[int(var)] = int(value)
+
+        return completed, None
+
     def cut_to_linear(self, cut):
         n_vars = self.cnf_handler.n_vars
         linear = [cut[i+1] for i in range(n_vars)]
 
         return linear
 
-    def linear_to_witness(self, linear_sol):
-        n_vars = self.cnf_handler.n_vars
+    def linear_to_witness(self, linear_sol, n_vars=None):
+        n_vars = self.cnf_handler.n_vars if n_vars is None else n_vars
         witness = [i+1 if linear_sol[i]== 1 else -i-1 for i in range(n_vars) if linear_sol[i].is_integer()]
 
         return witness
@@ -426,10 +699,16 @@ class HybridSolver:
         sat = False
         n_vars = self.cnf_handler.n_vars
         if witness is not None:
-            sat = self.lp_solver.verify(witness[:n_vars])
+            if self.preprocessor is not None:
+                # witness of the input formula, checked against its clauses
+                witness = self.preprocessor.extend(witness[:n_vars])
+                n_vars = len(witness)
+                sat = self.preprocessor.verify(witness)
+            else:
+                sat = self.lp_solver.verify(witness[:n_vars])
             if sat is True:
                 print("SATISFIABLE")
-                witness = self.linear_to_witness(witness)
+                witness = self.linear_to_witness(witness, n_vars)
                 print(f"WITNESS: {witness[:n_vars]}")
 
             else:
@@ -439,3 +718,20 @@ class HybridSolver:
 
         print("UNSATISFIABLE")
         return sat
+
+def solve_component(task):
+
+    # worker of HybridSolver.solve_components: solves one component given as its clauses
+    # RETURN : the 0/1 values of its variables, None if it is UNSAT
+    lp_solver, options, n_vars, clauses, cut_name = task
+    cnf_handler = CNFLoader()
+    cnf_handler.n_vars = n_vars
+    cnf_handler.clauses = [list(c) for c in clauses]
+    cnf_handler.m_clauses = len(clauses)
+
+    solver = HybridSolver(None, lp_solver, cnf_handler=cnf_handler, **options)
+    witness = solver.optimize(generate_cut=getattr(solver, cut_name))
+    if witness is None:
+        return None
+
+    return np.round(np.asarray(witness[:n_vars], dtype=float))
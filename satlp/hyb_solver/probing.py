@@ -0,0 +1,62 @@
+from concurrent.futures import ProcessPoolExecutor
+from scipy.optimize import linprog
+import numpy as np
+
+# relaxation A_ub x <= y_ub, x in [0,1]^n of the worker processes, set once by the pool initializer
+_model = {}
+
+def init_model(A_ub, y_ub, method):
+    _model['A_ub'] = A_ub
+    _model['y_ub'] = y_ub
+    _model['method'] = method
+
+def probe_bounds(columns):
+
+    # RETURN : min x_i and max x_i over the relaxation for each i in columns (None = infeasible);
+    # a column seen at 0 (or 1) in an optimum of the batch skips its own min (or max) LP
+    A_ub, y_ub, method = _model['A_ub'], _model['y_ub'], _model['method']
+    n_cols = A_ub.shape[1]
+    lower = {}
+    upper = {}
+    for i in columns:
+        for sign, bound in [(1, lower), (-1, upper)]:
+            if i in bound:
+                continue
+            c = np.zeros(n_cols)
+            c[i] = sign
+            result = linprog(c, A_ub=A_ub, b_ub=y_ub, bounds=(0, 1), method=method)
+            if not result.success:
+                return None
+
+            bound[i] = result.x[i]
+            for j in columns:
+                if result.x[j] <= 0 and j not in lower:
+                    lower[j] = 0.0
+                if result.x[j] >= 1 and j not in upper:
+                    upper[j] = 1.0
+
+    return [(lower[i], upper[i]) for i in columns]
+
+def lp_backbone(A_ub, y_ub, columns, method='highs-ds', n_jobs=None, batch_size=16, tol=1e-6):
+
+    # columns of the relaxation that take the same value in all its points: min x_i > 0 forces
+    # x_i = 1 and max x_i < 1 forces x_i = 0; the batches of columns are independent LPs
+    # RETURN : (columns forced to 1, columns forced to 0), None if the relaxation is infeasible
+    columns = list(columns)
+    batches = [columns[k:k+batch_size] for k in range(0, len(columns), batch_size)]
+    if n_jobs == 1 or len(batches) <= 1:
+        init_model(A_ub, y_ub, method)
+        results = [probe_bounds(batch) for batch in batches]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=init_model, initargs=(A_ub, y_ub, method)) as pool:
+            results = list(pool.map(probe_bounds, batches))
+
+    if any(r is None for r in results):
+        return None
+
+    bounds = np.array([b for r in results for b in r]).reshape(-1, 2)
+    columns = np.array(columns, dtype=np.int64)
+    ones = columns[bounds[:, 0] > tol]
+    zeros = columns[bounds[:, 1] < 1 - tol]
+
+    return ones, zeros
\ No newline at end of file
@@ -1,16 +1,37 @@
 from satlp.linear_solver.sat_baseclass.sat_baseclass import SATasLPBaseclass
+from satlp.linear_solver.clause_matrix import (
+    clause_matrix,
+    apply_fixing,
+    unit_propagate,
+    empty_columns,
+)
+from satlp.linear_solver.highs_model import HighsModel
+from satlp.linear_solver.clause_evaluator import ClauseEvaluator
+from satlp.linear_solver.clause_evaluator.clause_evaluator import SAT, FALSIFIED
 
 from scipy.optimize import linprog
+from scipy.sparse import vstack
 import numpy as np
 from abc import ABC, abstractmethod
 
 class SATasLP(SATasLPBaseclass):
 
-    def __init__(self, filename=None, cnf_handler=None, method=None, eps=1e-8):
+    def __init__(
+        self, 
+        filename=None, 
+        cnf_handler=None, 
+        method=None, 
+        eps=1e-8, 
+        backend='scipy', 
+        lazy=False, 
+        lazy_size=None,
+        lazy_tol=1e-6,
+        presolve=True,
+        lp_learnts=None,
+    ):
         super().__init__(filename, cnf_handler)
         self.eps = eps
         self.solver = linprog
-        self.g = lambda x: 1 - self.fixing[abs(x)] if x < 0 else self.fixing[abs(x)]
         self.A_ub = None
         self.y_ub = None
         self.A_eq = None
@@ -19,35 +40,67 @@ class SATasLP(SATasLPBaseclass):
         self.bounds = None
         self.method = method
 
+        # 'scipy' = rebuild and solve each LP with linprog, 'highs' = keep a live HiGHS model
+        self.backend = backend
+        self.highs = None
+        self.highs_loaded = None
+        self.highs_rows = None
+
+        # lazy constraint generation: solve on a working set of clause rows and
+        # add the violated ones on demand (lazy_size = initial working set, n_vars by default)
+        self.lazy = lazy
+        self.lazy_size = lazy_size
+        self.lazy_tol = lazy_tol
+        self.last_x = None
+
+        # presolve: the fixing is extended by unit propagation before building the LP,
+        # a conflict is reported without calling the solver and empty columns are dropped
+        self.use_presolve = presolve
+        self.fixed = None
+        self.values = None
+        self.conflict = False
+
+        # clause rows built once per clause set and reused across fixings
+        # (base_rows = indices in cnf_handler.clauses of the rows of base_A)
+        self.base_A = None
+        self.base_A_csc = None
+        self.base_n_neg = None
+        self.base_m = 0
+        self.base_rows = np.zeros(0, dtype=np.int64)
+        self.base_clock = 0
+        self.base_n_vars = None
+        self.evaluator = None
+
+        # maximum number of learnt clauses mirrored into the LP besides the units and binaries,
+        # the most recently learnt ones (None = all)
+        self.lp_learnts = lp_learnts
+
         if not self.solver:
             raise Exception("Solver creation failed")
 
     def solve(self):
-        
-        result = self.solver(
-            self.c, 
-            A_eq=self.A_eq, 
-            b_eq=self.y_eq,
-            A_ub=self.A_ub, 
-            b_ub=self.y_ub, 
-            bounds=self.bounds, 
-            method=self.method,
-        )
 
-        res = result.fun
+        # the presolve already found a falsified clause
+        if self.conflict:
+            print("INFEASIBLE")
+            return None, None
+
+        if self.backend == 'highs':
+            x, res = self.solve_persistent()
+
+        elif self.lazy:
+            x, res = self.solve_lazy()
+
+        else:
+            x, res = self.run_linprog(self.A_ub, self.y_ub)
+
         # print(f"LAST OPTIMIZATION RESULT: {res}")
 
-        x = result.x
-        
-        if result.success:
-            witness = np.array(
-                [
-                    x[i-1].item() 
-                    if i not in self.fixing.keys() 
-                    else self.fixing[i] 
-                    for i in range(1,len(x)+1)
-                ]
-            )
+        if x is not None:
+            self.last_x = x
+            n_vars = self.cnf_handler.n_vars
+            witness = x.copy()
+            witness[:n_vars][self.fixed] = self.values[self.fixed]
 
             return witness, res
 
@@ -55,114 +108,353 @@ class SATasLP(SATasLPBaseclass):
         print("INFEASIBLE")
         return None, None
 
-    def verify(self, witness):
+    def run_linprog(self, A_ub, y_ub):
 
-        if witness is None:
-            return False
+        n_cols = len(self.c)
+        lb, ub = self.bounds_arrays(n_cols)
+        keep = np.ones(n_cols, dtype=bool)
+        if self.use_presolve:
+            keep = ~empty_columns(n_cols, A_ub, self.A_eq)
+
+        # an empty column sits at the bound its cost points to
+        x = np.where(self.c < 0, ub, lb)
+        res = self.c[~keep] @ x[~keep]
+
+        # nothing left to optimize, only constant rows
+        if not keep.any():
+            feasible = np.all(y_ub >= -self.lazy_tol) if y_ub is not None else True
+            if self.y_eq is not None:
+                feasible = feasible and np.allclose(self.y_eq, 0)
+            return (x, res) if feasible else (None, None)
+
+        result = self.solver(
+            self.c[keep], 
+            A_eq=self.A_eq[:, keep] if self.A_eq is not None else None, 
+            b_eq=self.y_eq,
+            A_ub=A_ub[:, keep] if A_ub is not None else None, 
+            b_ub=y_ub, 
+            bounds=np.column_stack([lb[keep], ub[keep]]), 
+            method=self.method,
+        )
+
+        if result.success:
+            x[keep] = result.x
+            return x, result.fun + res
+
+        return None, None
+
+    def bounds_arrays(self, n_cols):
+
+        bounds = np.broadcast_to(np.asarray(self.bounds, dtype=np.float64), (n_cols, 2))
+        return bounds[:, 0].copy(), bounds[:, 1].copy()
+
+    def start_point(self, n_cols):
+
+        # last LP optimum if it still fits the model, otherwise the center of the box
+        if self.last_x is not None and len(self.last_x) == n_cols:
+            x = self.last_x.copy()
+        else:
+            lb, ub = self.bounds_arrays(n_cols)
+            x = (lb + ub)/2
 
-        clauses = self.cnf_handler.clauses
         n_vars = self.cnf_handler.n_vars
-        ver_witness = np.array([-1 if xi == 0 else 1 if xi == 1 else 0 for xi in witness[:n_vars]])
-        for c in clauses:
-            abs_c = np.abs(c) 
-            idx = abs_c - 1
-            sgn = c/abs_c
-            res = np.max(ver_witness[idx]*sgn)
+        x[:n_vars][self.fixed] = self.values[self.fixed]
 
-            if res != 1:
-                return False
+        return x
 
-        return True
+    def working_set(self, slack):
 
-    def check_conflict(self, witness):
+        # the rows closest to being violated at the start point
+        m_rows = len(slack)
+        size = self.lazy_size if self.lazy_size is not None else self.cnf_handler.n_vars
+        if size >= m_rows:
+            return np.arange(m_rows)
+
+        return np.argpartition(slack, size)[:size]
+
+    def violated_rows(self, A_ub, y_ub, x, active):
+
+        violated = (A_ub @ x - y_ub > self.lazy_tol) & ~active
+        return np.flatnonzero(violated)
 
-        clauses = self.cnf_handler.clauses
+    def solve_lazy(self):
+
+        # solve on a subset of the clause rows and add the violated ones until none is left
+        A_ub, y_ub = self.A_ub, self.y_ub
+        m_rows = A_ub.shape[0]
+        x = self.start_point(A_ub.shape[1])
+
+        active = np.zeros(m_rows, dtype=bool)
+        active[self.working_set(y_ub - A_ub @ x)] = True
+        while True:
+
+            rows = np.flatnonzero(active)
+            x, res = self.run_linprog(A_ub[rows], y_ub[rows])
+
+            # a subset of the constraints is already infeasible
+            if x is None:
+                return None, None
+
+            violated = self.violated_rows(A_ub, y_ub, x, active)
+            if len(violated) == 0:
+                return x, res
+
+            active[violated] = True
+
+    def solve_persistent(self):
+
+        # the fixing is applied as column bounds over the unfixed clause rows, so between
+        # two calls only bounds, costs and the rows of appended clauses change
+        A, _, n_neg = self.base_model()
         n_vars = self.cnf_handler.n_vars
-        ver_witness = np.array([-1 if xi == 0 else 1 if xi == 1 else 0 for xi in witness[:n_vars]])
+        n_cols = len(self.c)
+        m_clauses = A.shape[0]
+
+        lb, ub = self.bounds_arrays(n_cols)
+        lb[:n_vars][self.fixed] = self.values[self.fixed]
+        ub[:n_vars][self.fixed] = self.values[self.fixed]
+
+        if self.highs is None:
+            self.highs = HighsModel(self.method)
+            self.highs.add_cols(self.c, lb, ub)
+            if self.A_eq is not None:
+                self.highs.add_rows(self.A_eq, self.y_eq, self.y_eq)
+            self.highs_loaded = np.zeros(0, dtype=bool)
+            self.highs_rows = np.zeros(0, dtype=np.int64)
+
+        # clause rows in the model (all of them, or the lazy working set)
+        n_loaded = len(self.highs_loaded)
+        if n_loaded < m_clauses:
+            self.highs_loaded = np.concatenate([self.highs_loaded, np.zeros(m_clauses - n_loaded, dtype=bool)])
+            self.highs_rows = np.concatenate([self.highs_rows, np.full(m_clauses - n_loaded, -1, dtype=np.int64)])
 
-        for c in clauses:
-            abs_c = np.abs(c) 
-            idx = abs_c - 1
-            sgn = c/abs_c
-            res = np.max(ver_witness[idx]*sgn)
+        # Ax >= 1 - n_neg in <= form
+        A_ub = -A[:, :n_vars]
+        y_ub = n_neg - 1
+        if not self.lazy:
+            rows = np.flatnonzero(~self.highs_loaded)
 
-            if res == -1:
-                return True
+        elif n_loaded == 0:
+            x = self.start_point(n_cols)[:n_vars]
+            rows = self.working_set(y_ub - A_ub @ x)
 
-        return False
+        else:
+            rows = np.arange(0)
+
+        self.highs.set_costs(self.c)
+        self.highs.set_bounds(lb, ub)
+        while True:
+
+            self.highs_rows[rows] = self.highs.n_rows + np.arange(len(rows))
+            self.highs.add_rows(A[rows], 1 - n_neg[rows], np.full(len(rows), np.inf))
+            self.highs_loaded[rows] = True
+
+            x, res = self.highs.solve()
+            if x is None or not self.lazy:
+                return x, res
+
+            rows = self.violated_rows(A_ub, y_ub, x[:n_vars], self.highs_loaded)
+            if len(rows) == 0:
+                return x, res
+
+    def clause_evaluator(self):
+
+        # rebuilt only when the clause set changed
+        A, _, n_neg = self.base_model()
+        if self.evaluator is None or self.evaluator.m_clauses != A.shape[0]:
+            self.evaluator = ClauseEvaluator(A, n_neg)
+
+        return self.evaluator
+
+    def clause_status(self, witness):
+        evaluator = self.clause_evaluator()
+        return evaluator.status(evaluator.to_ternary(witness))
+
+    def verify(self, witness):
+
+        if witness is None:
+            return False
+
+        return bool(np.all(self.clause_status(witness) == SAT))
+
+    def verify_batch(self, witnesses, chunk_size=1024):
+
+        # rows are candidate witnesses, returns which satisfy the formula and
+        # how many clauses each one falsifies (fractional values count as unassigned)
+        evaluator = self.clause_evaluator()
+        ternary = evaluator.to_ternary(np.atleast_2d(witnesses))
+        k = ternary.shape[0]
+
+        sat = np.zeros(k, dtype=bool)
+        n_falsified = np.zeros(k, dtype=np.int64)
+        for start in range(0, k, chunk_size):
+            status = evaluator.status(ternary[start:start+chunk_size])
+            sat[start:start+chunk_size] = np.all(status == SAT, axis=1)
+            n_falsified[start:start+chunk_size] = np.sum(status == FALSIFIED, axis=1)
+
+        return sat, n_falsified
+
+    def check_conflict(self, witness):
+        return bool(np.any(self.clause_status(witness) == FALSIFIED))
 
     def check_blocked(self, witness):
 
-        clauses = self.cnf_handler.clauses
-        n_vars = self.cnf_handler.n_vars
-        ver_witness = np.array([-1 if xi == 0 else 1 if xi == 1 else 0 for xi in witness[:n_vars]])
+        evaluator = self.clause_evaluator()
+        ternary = evaluator.to_ternary(witness)
+        status = evaluator.status(ternary)
 
-        if self.verify(witness):
+        if np.all(status == SAT):
             return False
 
-        for i, xi in enumerate(ver_witness):
-            if xi == 0:
-                # pick xi = [-1, 1] and check for conflicts
-                aux = ver_witness[i]
-                for v in [-1, 1]:
-                    ver_witness[i] = v
-                    if not self.check_conflict(ver_witness):
-                        return False
+        if np.any(status == FALSIFIED):
+            return True
 
-                ver_witness[i] = aux
+        # x_i = v conflicts iff a clause is left with only the literal falsified by v,
+        # so a variable is blocked when unit clauses force it both ways
+        forced_true, forced_false = evaluator.unit_literals(ternary)
+        unassigned = ternary == 0
 
-        return True
+        return bool(np.all(forced_true[unassigned] & forced_false[unassigned]))
         
     def get_conflict_clauses(self, partial_witness):
-        sat_clauses = []
-        unsat_clauses = []
-        clauses = self.cnf_handler.clauses
-        n_vars = self.cnf_handler.n_vars
-        witness = np.array([-1 if xi == 0 else 1 if xi == 1 else 0 for xi in partial_witness[:n_vars]])
 
-        for i, c in enumerate(clauses):
-
-            abs_c = np.abs(c) 
-            idx = abs_c - 1
-            sgn = c/abs_c
-            res = np.max(witness[idx]*sgn)
-
-            if res == 1:
-                sat_clauses.append(i)
-            elif res == -1:
-                unsat_clauses.append(i)
+        # indices in cnf_handler.clauses (learnt clauses out of the LP window are not checked)
+        status = self.clause_status(partial_witness)
+        sat_clauses = self.base_rows[status == SAT].tolist()
+        unsat_clauses = self.base_rows[status == FALSIFIED].tolist()
 
         return sat_clauses, unsat_clauses
 
 
     def get_active_clauses(self, partial_witness):
 
-        sat_clauses = []
-        unsat_clauses = []
-        clauses = self.cnf_handler.clauses
+        status = self.clause_status(partial_witness)
+        sat_clauses = self.base_rows[status == SAT].tolist()
+        unsat_clauses = self.base_rows[status != SAT].tolist()
+
+        return sat_clauses, unsat_clauses
+
+    def fixing_arrays(self):
+
+        # boolean mask of the fixed variables and their values (indexed by x_i-1)
         n_vars = self.cnf_handler.n_vars
-        witness = np.array([-1 if xi == 0 else 1 if xi == 1 else 0 for xi in partial_witness[:n_vars]])
+        fixed = np.zeros(n_vars, dtype=bool)
+        values = np.zeros(n_vars)
+        if len(self.fixing) > 0:
+            idx = np.fromiter(self.fixing.keys(), dtype=np.int64, count=len(self.fixing)) - 1
+            fixed[idx] = True
+            values[idx] = np.fromiter(self.fixing.values(), dtype=np.float64, count=len(self.fixing))
 
-        for i, c in enumerate(clauses):
+        return fixed, values
 
-            abs_c = np.abs(c) 
-            idx = abs_c - 1
-            sgn = c/abs_c
-            res = np.max(witness[idx]*sgn)
+    def base_model(self):
 
-            if res == 1:
-                sat_clauses.append(i)
+        n_vars = self.cnf_handler.n_vars
+        m_clauses = self.cnf_handler.m_clauses
+        clock = self.cnf_handler.learnt_clock
+        if self.base_A is not None and m_clauses == self.base_m and clock == self.base_clock:
+            return self.base_A, self.base_A_csc, self.base_n_neg
+
+        # the rows are rebuilt when clauses were replaced or new ones brought new variables
+        if self.base_A is None or m_clauses < self.base_m or n_vars != self.base_n_vars:
+            self.base_A = None
+            self.base_m = 0
+            self.base_rows = np.zeros(0, dtype=np.int64)
+            self.highs = None
+
+        # the original clauses and the most recently learnt ones
+        rows = self.cnf_handler.selected_rows(self.lp_learnts)
+
+        # learnt clauses out of the window leave the model, new clauses are appended, and so
+        # are the learnt clauses learnt again since they left
+        kept = np.isin(self.base_rows, rows)
+        new_rows = rows[rows >= self.base_m]
+        if self.lp_learnts is not None:
+            old_rows = rows[rows < self.base_m]
+            new_rows = np.concatenate([old_rows[~np.isin(old_rows, self.base_rows)], new_rows])
+        A, n_neg = self.base_A, self.base_n_neg
+        if not np.all(kept):
+            A, n_neg = A[kept], n_neg[kept]
+            self.drop_highs_rows(kept)
+            self.evaluator = None
+
+        # the clause evaluator is extended with the appended rows, rebuilt when rows leave
+        if len(new_rows) > 0 or A is None:
+            literals, offsets = self.cnf_handler.clause_arrays(new_rows)
+            A_new, n_neg_new = clause_matrix(literals, offsets, n_vars)
+            if self.evaluator is not None and A is not None and self.evaluator.m_clauses == A.shape[0]:
+                self.evaluator.extend(A_new, n_neg_new)
             else:
-                unsat_clauses.append(i)
+                self.evaluator = None
+            if A is not None:
+                A_new = vstack([A, A_new], format='csr')
+                n_neg_new = np.concatenate([n_neg, n_neg_new])
+            A, n_neg = A_new, n_neg_new
 
-        return sat_clauses, unsat_clauses
+        self.base_A = A
+        self.base_A_csc = A.tocsc()
+        self.base_n_neg = n_neg
+        self.base_rows = np.concatenate([self.base_rows[kept], new_rows])
+        self.base_m = m_clauses
+        self.base_clock = clock
+        self.base_n_vars = n_vars
+
+        return self.base_A, self.base_A_csc, self.base_n_neg
+
+    def drop_highs_rows(self, kept):
+
+        # removes the dropped clause rows from the persistent model, the other rows shift down
+        if self.highs is None:
+            return
+
+        n_loaded = len(self.highs_loaded)
+        kept = kept[:n_loaded]
+        dropped = np.sort(self.highs_rows[:n_loaded][~kept & self.highs_loaded])
+        self.highs.delete_rows(dropped)
+
+        highs_rows = self.highs_rows[:n_loaded][kept]
+        loaded = highs_rows >= 0
+        highs_rows[loaded] -= np.searchsorted(dropped, highs_rows[loaded])
+        self.highs_rows = highs_rows
+        self.highs_loaded = self.highs_loaded[kept]
+
+    def clause_constraints(self, n_cols=None):
+
+        # the persistent model keeps the clause rows and applies the fixing itself
+        if self.backend == 'highs':
+            return None, None
+
+        A, A_csc, n_neg = self.base_model()
+
+        return apply_fixing(A, A_csc, n_neg, self.fixed, self.values, n_cols)
+
+    def presolve(self):
+
+        fixed, values = self.fixing_arrays()
+        self.fixed, self.values = fixed, values
+        self.conflict = False
+        if not self.use_presolve:
+            return
+
+        A, A_csc, n_neg = self.base_model()
+        fixed, values = unit_propagate(A, A_csc, n_neg, fixed, values)
+
+        # keep the plain fixing to build the (unused) model of a conflicting fixing
+        if fixed is None:
+            self.conflict = True
+            return
+
+        self.fixed, self.values = fixed, values
 
     def load_cnf(self, filename):
         self.cnf_handler.load(filename)
+        self.base_A = None
+        self.highs = None
 
     def create_lp(self, filename=None):
         if filename:
             self.load_cnf(filename)
+        self.presolve()
         self._init_objects()
         self._create_optimization()
 
@@ -0,0 +1 @@
+from satlp.linear_solver.clause_evaluator.clause_evaluator import ClauseEvaluator
\ No newline at end of file
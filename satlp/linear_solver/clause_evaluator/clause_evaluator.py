@@ -0,0 +1,87 @@
+from scipy.sparse import vstack
+import numpy as np
+
+# clause status
+SAT = 1
+UNDETERMINED = 0
+FALSIFIED = -1
+
+class ClauseEvaluator:
+
+    def __init__(self, A, n_neg):
+
+        # literal incidence: column j of positive (negative) is the literal x_j+1 (-x_j+1), in
+        # the smallest integer type holding a clause length so that counts stay exact
+        m_clauses, n_vars = A.shape
+        self.n_vars = n_vars
+        self.m_clauses = m_clauses
+        self.positive = A.maximum(0).tocsr()
+        self.negative = (-A).maximum(0).tocsr()
+        self.length = np.diff(self.positive.indptr) + np.diff(self.negative.indptr)
+        self.set_dtype()
+
+        # tautologies lost their x/-x pair in A, they are always satisfied
+        self.tautology = n_neg > np.diff(self.negative.indptr)
+
+    def set_dtype(self):
+        dtype = np.min_scalar_type(int(self.length.max(initial=1)))
+        self.positive = self.positive.astype(dtype)
+        self.negative = self.negative.astype(dtype)
+
+    def extend(self, A, n_neg):
+        # rows of appended clauses, the rows already there are kept
+        other = ClauseEvaluator(A, n_neg)
+        self.m_clauses += other.m_clauses
+        self.positive = vstack([self.positive, other.positive], format='csr')
+        self.negative = vstack([self.negative, other.negative], format='csr')
+        self.length = np.concatenate([self.length, other.length])
+        self.set_dtype()
+        self.tautology = np.concatenate([self.tautology, other.tautology])
+
+    def to_ternary(self, witness):
+
+        # 1 = TRUE, -1 = FALSE, 0 = UNASSIGNED (fractional values are unassigned)
+        witness = np.asarray(witness)[..., :self.n_vars]
+        return np.where(witness == 1, 1, np.where(witness == 0, -1, 0)).astype(np.int8)
+
+    def count(self, ternary):
+
+        # number of true and false literals per clause, for one witness (n,) or a batch (k, n);
+        # the incidence is multiplied by boolean (n, k) indicators of the true and false
+        # variables, nothing of the size of the literals times the batch is built in floats
+        ternary = np.atleast_2d(ternary)
+        true_vars = (ternary == 1).T
+        false_vars = (ternary == -1).T
+
+        n_true = self.positive @ true_vars
+        n_true += self.negative @ false_vars
+        n_false = self.positive @ false_vars
+        n_false += self.negative @ true_vars
+
+        return n_true.T, n_false.T
+
+    def status(self, ternary):
+
+        # SAT / FALSIFIED / UNDETERMINED for each clause, shape (m,) or (k, m) for a batch
+        n_true, n_false = self.count(ternary)
+        sat = (n_true > 0) | self.tautology
+        falsified = ~sat & (n_false == self.length)
+        status = np.where(sat, SAT, np.where(falsified, FALSIFIED, UNDETERMINED)).astype(np.int8)
+
+        return status if np.ndim(ternary) > 1 else status[0]
+
+    def unit_literals(self, ternary):
+
+        # literals left alone in an otherwise falsified clause, as (forced_true, forced_false) masks
+        n_true, n_false = self.count(ternary)
+        n_true, n_false = n_true[0], n_false[0]
+        unit = ~self.tautology & (n_true == 0) & (self.length - n_false == 1)
+
+        free = np.asarray(ternary) == 0
+        forced_true = np.zeros(self.n_vars, dtype=bool)
+        forced_false = np.zeros(self.n_vars, dtype=bool)
+        for forced, incidence in [(forced_true, self.positive), (forced_false, self.negative)]:
+            variables = incidence[unit].indices
+            forced[variables[free[variables]]] = True
+
+        return forced_true, forced_false
@@ -0,0 +1,8 @@
+from satlp.linear_solver.clause_matrix.clause_matrix import (
+    flatten_clauses,
+    clause_matrix,
+    apply_fixing,
+    unit_propagate,
+    empty_columns,
+    clause_constraints,
+)
\ No newline at end of file
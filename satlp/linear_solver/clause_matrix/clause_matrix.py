@@ -0,0 +1,147 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from satlp.cnf_loader.cnf_loader import flatten_clauses
+
+def clause_matrix(literals, offsets, n_vars, n_cols=None):
+
+    # A[i][j] = sign of x_j+1 in clause i, n_neg[i] = number of negated literals in clause i
+    # so that clause i is satisfied by x in [0,1]^n iff A[i] @ x >= 1 - n_neg[i]
+    n_cols = n_vars if n_cols is None else n_cols
+    m_clauses = len(offsets) - 1
+    literals = np.asarray(literals, dtype=np.int64)
+    rows = np.repeat(np.arange(m_clauses, dtype=np.int64), np.diff(offsets))
+
+    # repeated literals inside a clause count only once
+    keys = np.unique(rows*(2*n_vars + 1) + literals + n_vars)
+    rows = keys // (2*n_vars + 1)
+    literals = keys % (2*n_vars + 1) - n_vars
+
+    signs = np.sign(literals).astype(np.float64)
+    n_neg = np.bincount(rows, weights=(literals < 0), minlength=m_clauses)
+
+    # tautologies (x and -x in the same clause) sum up to an empty coefficient
+    A = csr_matrix(
+        (signs, (rows, np.abs(literals) - 1)),
+        shape=(m_clauses, n_cols),
+    )
+    A.sum_duplicates()
+    A.eliminate_zeros()
+
+    return A, n_neg
+
+def row_entries(A, rows):
+    # RETURN : positions in A.data / A.indices of the entries of the given CSR rows
+    starts = A.indptr[rows]
+    lengths = A.indptr[rows + 1] - starts
+
+    return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+def apply_fixing(A, A_csc, n_neg, fixed, values, n_cols=None):
+
+    # A_ub x <= y_ub for the clauses after fixing, computed as a delta over the base matrix:
+    # fixed columns are blanked, their contribution goes to the right-hand side and
+    # rows already satisfied by the fixing are dropped; only the rows holding a fixed
+    # variable are visited, the others are copied as they are
+    m_clauses, n_vars = A.shape
+    n_cols = n_vars if n_cols is None else n_cols
+
+    # only the columns of the fixed variables are visited
+    idx = np.flatnonzero(fixed)
+    fixed_cols = A_csc[:, idx]
+    y_lb = 1 - n_neg - fixed_cols @ values[idx]
+
+    # a fixed literal is true when its sign agrees with the fixed value
+    col = np.repeat(values[idx], np.diff(fixed_cols.indptr))
+    true_lit = fixed_cols.data*(2*col - 1) > 0
+    keep = np.ones(m_clauses, dtype=bool)
+    keep[fixed_cols.indices[true_lit]] = False
+
+    # the fixed columns are blanked in the rows left that hold a false fixed literal, their
+    # entries are found from those rows only
+    touched = np.zeros(m_clauses, dtype=bool)
+    touched[fixed_cols.indices[~true_lit]] = True
+    touched = np.flatnonzero(touched[keep])
+
+    A = A[keep]
+    entries = row_entries(A, touched)
+    data = -A.data
+    data[entries[fixed[A.indices[entries]]]] = 0
+    A = csr_matrix((data, A.indices, A.indptr), shape=(A.shape[0], n_cols))
+    A.eliminate_zeros()
+
+    # scipy linprog deals with only minimization of upperbounded matrices
+    return A, -y_lb[keep]
+
+def unit_propagate(A, A_csc, n_neg, fixed, values):
+
+    # propagates the fixing through the clause rows until a fixed point or a conflict,
+    # returns the extended (fixed, values) or (None, None) if some clause is falsified
+    m_clauses, n_vars = A.shape
+    fixed = fixed.copy()
+    values = values.copy()
+
+    rows = np.repeat(np.arange(m_clauses), np.diff(A.indptr))
+    lit_fixed = fixed[A.indices]
+    lit_true = lit_fixed & (A.data*(2*values[A.indices] - 1) > 0)
+
+    # per clause: number of true literals and number of unassigned literals
+    n_true = np.bincount(rows[lit_true], minlength=m_clauses)
+    n_free = np.bincount(rows[~lit_fixed], minlength=m_clauses)
+
+    # tautologies lost their x/-x pair in the matrix, they are always satisfied
+    n_neg_entries = np.bincount(rows[A.data < 0], minlength=m_clauses)
+    n_true[n_neg > n_neg_entries] += 1
+
+    touched = np.arange(m_clauses)
+    while True:
+
+        open_rows = touched[n_true[touched] == 0]
+        if np.any(n_free[open_rows] == 0):
+            return None, None
+
+        units = open_rows[n_free[open_rows] == 1]
+        if len(units) == 0:
+            return fixed, values
+
+        # entries of the unit rows, keeping the only unassigned one
+        entries = row_entries(A, units)
+        entries = entries[~fixed[A.indices[entries]]]
+        cols = A.indices[entries]
+        signs = A.data[entries]
+
+        # the same variable implied with both signs
+        positive = np.zeros(n_vars, dtype=bool)
+        negative = np.zeros(n_vars, dtype=bool)
+        positive[cols[signs > 0]] = True
+        negative[cols[signs < 0]] = True
+        if np.any(positive & negative):
+            return None, None
+
+        new = np.unique(cols)
+        fixed[new] = True
+        values[new] = positive[new]
+
+        # only the clauses of the newly fixed variables change their counts
+        fixed_cols = A_csc[:, new]
+        col = np.repeat(values[new], np.diff(fixed_cols.indptr))
+        lit_true = fixed_cols.data*(2*col - 1) > 0
+        np.add.at(n_true, fixed_cols.indices[lit_true], 1)
+        np.subtract.at(n_free, fixed_cols.indices, 1)
+        touched = np.unique(fixed_cols.indices)
+
+def empty_columns(n_cols, *matrices):
+
+    # columns without any coefficient in the given constraint matrices
+    used = np.zeros(n_cols, dtype=bool)
+    for M in matrices:
+        if M is not None:
+            used[M.indices] = True
+
+    return ~used
+
+def clause_constraints(clauses, n_vars, fixed, values, n_cols=None):
+
+    literals, offsets = flatten_clauses(clauses)
+    A, n_neg = clause_matrix(literals, offsets, n_vars)
+
+    return apply_fixing(A, A.tocsc(), n_neg, fixed, values, n_cols)
\ No newline at end of file
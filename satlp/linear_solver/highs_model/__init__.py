@@ -0,0 +1 @@
+from satlp.linear_solver.highs_model.highs_model import HighsModel
\ No newline at end of file
@@ -0,0 +1,95 @@
+import numpy as np
+
+try:
+    import highspy
+except ImportError:
+    highspy = None
+
+# HiGHS keeps the last basis when only costs, bounds or new rows change,
+# so re-solving a slightly modified model hot-starts the simplex
+
+class HighsModel:
+
+    def __init__(self, method='highs-ds'):
+        if highspy is None:
+            raise ImportError("The persistent HiGHS backend requires highspy (pip install highspy).")
+
+        self.highs = highspy.Highs()
+        self.highs.setOptionValue("output_flag", False)
+        if method == 'highs-ds':
+            self.highs.setOptionValue("solver", "simplex")
+        elif method == 'highs-ipm':
+            self.highs.setOptionValue("solver", "ipm")
+
+        self.inf = highspy.kHighsInf
+        self.c = np.zeros(0)
+        self.lb = np.zeros(0)
+        self.ub = np.zeros(0)
+        self.n_cols = 0
+        self.n_rows = 0
+
+    def add_cols(self, c, lb, ub):
+        n = len(c)
+        self.highs.addVars(n, lb, ub)
+        idx = np.arange(self.n_cols, self.n_cols + n, dtype=np.int32)
+        self.highs.changeColsCost(n, idx, c)
+        self.c = np.concatenate([self.c, c])
+        self.lb = np.concatenate([self.lb, lb])
+        self.ub = np.concatenate([self.ub, ub])
+        self.n_cols += n
+
+    def add_rows(self, A, lower, upper):
+
+        # lower <= A x <= upper with A given as a csr matrix
+        n = A.shape[0]
+        if n == 0:
+            return
+
+        lower = np.where(np.isinf(lower), -self.inf, lower)
+        upper = np.where(np.isinf(upper), self.inf, upper)
+        self.highs.addRows(
+            n,
+            lower,
+            upper,
+            A.nnz,
+            A.indptr[:-1].astype(np.int32),
+            A.indices.astype(np.int32),
+            A.data.astype(np.float64),
+        )
+        self.n_rows += n
+
+    def delete_rows(self, rows):
+        n = len(rows)
+        if n == 0:
+            return
+
+        self.highs.deleteRows(n, np.asarray(rows, dtype=np.int32))
+        self.n_rows -= n
+
+    def set_costs(self, c):
+
+        # only the coefficients that changed are sent to the solver
+        idx = np.flatnonzero(self.c != c).astype(np.int32)
+        if len(idx) > 0:
+            self.highs.changeColsCost(len(idx), idx, c[idx])
+            self.c = c.copy()
+
+    def set_bounds(self, lb, ub):
+
+        idx = np.flatnonzero((self.lb != lb) | (self.ub != ub)).astype(np.int32)
+        if len(idx) > 0:
+            self.highs.changeColsBounds(len(idx), idx, lb[idx], ub[idx])
+            self.lb = lb.copy()
+            self.ub = ub.copy()
+
+    def solve(self):
+
+        self.highs.run()
+        status = self.highs.getModelStatus()
+        if status != highspy.HighsModelStatus.kOptimal:
+            return None, None
+
+        x = np.array(self.highs.getSolution().col_value)
+        res = self.highs.getInfo().objective_function_value
+
+        return x, res
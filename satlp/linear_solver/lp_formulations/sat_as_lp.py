@@ -1,40 +1,26 @@
 from satlp.linear_solver.baseclass_implementation import SATasLP
 from scipy.optimize import linprog
+from scipy.sparse import csr_matrix
 import numpy as np
 
 # for simplex use method='highs-ds' for IPM use method='highs-ipm'
 
 class SATasLPFeasibility(SATasLP):
 
-    def __init__(self, filename=None, cnf_handler=None, fixing={}, method='highs-ds'):
-        super().__init__(filename, cnf_handler, method)
+    def __init__(self, filename=None, cnf_handler=None, fixing={}, method='highs-ds', backend='scipy', lazy=False, presolve=True, lp_learnts=None):
+        super().__init__(filename, cnf_handler, method, backend=backend, lazy=lazy, presolve=presolve, lp_learnts=lp_learnts)
         self.fixing = fixing
 
     def _init_objects(self):
         
         n_vars = self.cnf_handler.n_vars
-        m_clauses = self.cnf_handler.m_clauses
-        clauses = self.cnf_handler.clauses
-
-        y_lb = np.zeros(shape=m_clauses)
-        A_lb = np.zeros(shape=(m_clauses, n_vars))
-        for i, c in enumerate(clauses):
-            
-            res_fixed = np.array([self.g(xi) for xi in c if abs(xi) in self.fixing.keys()])
-            res = np.array([np.sign(xi) for xi in c if abs(xi) not in self.fixing.keys()])
-
-            y_lb[i] = 1 - sum(res_fixed) - sum(res < 0)
-            for j in c:
-                idx = abs(j)-1
-                if abs(j) not in self.fixing.keys():
-                    A_lb[i][idx] = np.sign(j).item()
+        A_ub, y_ub = self.clause_constraints()
 
         # feasibility
         c = np.zeros(n_vars)
 
-        # scipy linprog deals with only minimization of upperbounded matrices 
-        self.y_ub = -y_lb
-        self.A_ub = -A_lb
+        self.y_ub = y_ub
+        self.A_ub = A_ub
         self.c = c
 
     def _create_optimization(self):
@@ -60,8 +46,12 @@ class SATasLPOptimization(SATasLP):
         last_coefs=None, 
         last_witness=None,
         method='highs-ipm',
+        backend='scipy',
+        lazy=False,
+        presolve=True,
+        lp_learnts=None,
     ):
-        super().__init__(filename, cnf_handler, method)
+        super().__init__(filename, cnf_handler, method, backend=backend, lazy=lazy, presolve=presolve, lp_learnts=lp_learnts)
         self.fixing = fixing
         self.last_coefs = last_coefs
         self.n_vars = cnf_handler.n_vars
@@ -71,76 +61,57 @@ class SATasLPOptimization(SATasLP):
     def _init_objects(self):
         
         n_vars = self.cnf_handler.n_vars
-        m_clauses = self.cnf_handler.m_clauses
-        clauses = self.cnf_handler.clauses
+        fixed = self.fixed
+        free = ~fixed
 
         # Ax <= y
-        y_lb = np.zeros(shape=m_clauses)
-        A_lb = np.zeros(shape=(m_clauses, 3*n_vars))
-
-        y_eq = np.zeros(shape=2*n_vars)
-        A_eq = np.zeros(shape=(2*n_vars, 3*n_vars))
-
-        # construct matrices following Ax >= y
-        for i, c in enumerate(clauses):
-
-            res_fixed = np.array([self.g(xi) for xi in c if abs(xi) in self.fixing.keys()])
-            res = np.array([np.sign(xi) for xi in c if abs(xi) not in self.fixing.keys()])
-            y_lb[i] = 1 - sum(res_fixed) - sum(res < 0)
-
-            for j in c:
-                idx = abs(j)-1
-                if abs(j) not in self.fixing.keys():
-                    A_lb[i][idx] = np.sign(j).item()
-
-
-        # flip signs to get Ax <= y
-        y_ub = -y_lb
-        A_ub = -A_lb
+        A_ub, y_ub = self.clause_constraints(n_cols=3*n_vars)
 
         # optimization
-        for i in range(n_vars):
-            if i+1 not in self.fixing.keys():
-                # x_i - y_i+ + y_i- = 1/2
-                A_eq[i][i] = 1
-                A_eq[i][n_vars+i] = -1
-                A_eq[i][2*n_vars+i] = 1
-                y_eq[i] = 1/2
-
-            # y_n+i + y_2n+i = 1/2
-                A_eq[n_vars+i][n_vars+i] = 1
-                A_eq[n_vars+i][2*n_vars+i] = 1
-                y_eq[n_vars+i] = 1/2
+        # x_i - y_i+ + y_i- = 1/2
+        # y_n+i + y_2n+i = 1/2
+        # (the persistent model loads these rows once, fixed x_i are pinned by their bounds)
+        eq_vars = free if self.backend != 'highs' else np.ones(n_vars, dtype=bool)
+        idx = np.flatnonzero(eq_vars)
+        rows = np.concatenate([idx, idx, idx, n_vars+idx, n_vars+idx])
+        cols = np.concatenate([idx, n_vars+idx, 2*n_vars+idx, n_vars+idx, 2*n_vars+idx])
+        data = np.concatenate([np.ones(len(idx)), -np.ones(len(idx)), np.ones(3*len(idx))])
+        A_eq = csr_matrix((data, (rows, cols)), shape=(2*n_vars, 3*n_vars))
+
+        y_eq = np.zeros(shape=2*n_vars)
+        y_eq[:n_vars][eq_vars] = 1/2
+        y_eq[n_vars:][eq_vars] = 1/2
 
         # min x+x- + ...
         c = np.zeros(3*n_vars)
+        c_plus = c[n_vars:2*n_vars]
+        c_minus = c[2*n_vars:]
         if self.last_witness is not None:
 
+            x = self.last_witness[:n_vars]
+            x_plus = self.last_witness[n_vars:2*n_vars]
+            x_minus = self.last_witness[2*n_vars:]
+
             # get boolean array of which variable is boolean
-            is_boolean = self.is_boolean(self.last_witness)
-            for i in range(n_vars):
-
-                if not is_boolean[i] and i+1 not in self.fixing.keys():
-                    if self.last_witness[n_vars+i] < self.last_witness[2*n_vars+i]:
-                        # x+ < x-
-                        c[2*n_vars+i] = 1
-                    elif self.last_witness[n_vars+i] > self.last_witness[2*n_vars+i]:
-                        # x- < x+
-                        c[n_vars+i] = 1
-                    elif self.last_witness[n_vars+i] == self.last_witness[2*n_vars+i]:
-                        c[n_vars+i] = self.last_coefs[2*n_vars+i]
-                        c[2*n_vars+i] = self.last_coefs[n_vars+i]
-                    # need to flip the coef if they are equal, but need last coef for this
-                        
-                elif is_boolean[i] and i+1 not in self.fixing.keys():
-                    if self.is_one(self.last_witness[i]):
-                        c[2*n_vars+i] = 1
-
-                    elif self.is_zero(self.last_witness[i]):
-                        c[n_vars+i] = 1
+            is_boolean = self.is_boolean(x)
+            fractional = ~is_boolean & free
+            boolean = is_boolean & free
+
+            # x+ < x-
+            c_minus[fractional & (x_plus < x_minus)] = 1
+            # x- < x+
+            c_plus[fractional & (x_plus > x_minus)] = 1
+            # need to flip the coef if they are equal, but need last coef for this
+            tie = fractional & (x_plus == x_minus)
+            c_plus[tie] = self.last_coefs[2*n_vars:][tie]
+            c_minus[tie] = self.last_coefs[n_vars:2*n_vars][tie]
+
+            is_one = self.is_one(x)
+            c_minus[boolean & is_one] = 1
+            c_plus[boolean & ~is_one & self.is_zero(x)] = 1
                     
         else:
-            c[2*n_vars:] = 1
+            c_minus[:] = 1
 
         # scipy linprog deals with only minimization of upperbounded matrices 
         self.y_ub = y_ub
@@ -151,7 +122,8 @@ class SATasLPOptimization(SATasLP):
 
     def _create_optimization(self):
 
-        n = self.n_vars
+        # clauses appended since __init__ may have brought new variables
+        n = self.n_vars = self.cnf_handler.n_vars
         self.bounds = [
             [0,1] if i < n 
             else [0, 1/2] 
@@ -193,8 +165,8 @@ class SATasLPOptimization(SATasLP):
 
 class SATasLPOptimizationDual(SATasLP):
 
-    def __init__(self, filename=None, cnf_handler=None, fixing={}, method='highs-ipm'):
-        super().__init__(filename, cnf_handler, method)
+    def __init__(self, filename=None, cnf_handler=None, fixing={}, method='highs-ipm', backend='scipy', lazy=False, presolve=True, lp_learnts=None):
+        super().__init__(filename, cnf_handler, method, backend=backend, lazy=lazy, presolve=presolve, lp_learnts=lp_learnts)
         self.fixing = fixing
         self.n_vars = cnf_handler.n_vars
         self.m_clauses = cnf_handler.m_clauses
@@ -202,32 +174,13 @@ class SATasLPOptimizationDual(SATasLP):
 
     def _init_objects(self):
         
-        n_vars = self.cnf_handler.n_vars
-        m_clauses = self.cnf_handler.m_clauses
-        clauses = self.cnf_handler.clauses
+        fixed = self.fixed
 
         # Ax <= y
-        y_lb = np.zeros(shape=m_clauses)
-        A_lb = np.zeros(shape=(m_clauses, n_vars))
-
-        # construct matrices following Ax >= y
-        for i, c in enumerate(clauses):
-            
-            res_fixed = np.array([self.g(xi) for xi in c if abs(xi) in self.fixing.keys()])
-            res = np.array([np.sign(xi) for xi in c if abs(xi) not in self.fixing.keys()])
-            y_lb[i] = 1 - sum(res_fixed) - sum(res < 0)
-
-            for j in c:
-                idx = abs(j)-1
-                if abs(j) not in self.fixing.keys():
-                    A_lb[i][idx] = np.sign(j).item()
-
-        # flip signs to get Ax <= y
-        y_ub = -y_lb
-        A_ub = -A_lb
+        A_ub, y_ub = self.clause_constraints()
 
         # optimization
-        c = np.array([1.0 if i+1 not in self.fixing.keys() else 0 for i in range(n_vars)])
+        c = np.where(fixed, 0.0, 1.0)
         self.c = c
         
         # scipy linprog deals with only minimization of upperbounded matrices 
@@ -236,7 +189,8 @@ class SATasLPOptimizationDual(SATasLP):
 
     def _create_optimization(self):
 
-        n = self.n_vars
+        # clauses appended since __init__ may have brought new variables
+        n = self.n_vars = self.cnf_handler.n_vars
         self.bounds = [
             [0,1]
             for i in range(n)
@@ -0,0 +1,3 @@
+from satlp.preprocessing.preprocessor import Preprocessor
+from satlp.preprocessing.equivalences import strongly_connected_components, equivalent_literals
+from satlp.preprocessing.components import UnionFind, connected_components, split_formula, residual_formula
\ No newline at end of file
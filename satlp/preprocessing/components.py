@@ -0,0 +1,93 @@
+import numpy as np
+
+class UnionFind:
+
+    def __init__(self, n):
+        self.parent = list(range(n))
+        self.size = [1]*n
+
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            # path halving
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return a
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return a
+
+def connected_components(clauses, n_vars):
+
+    # components of the variable-clause incidence graph (variables sharing a clause are merged),
+    # an empty clause has no variable and belongs to no component
+    # RETURN : list of (variables, clause indices), largest component first
+    uf = UnionFind(n_vars+1)
+    for c in clauses:
+        if len(c) == 0:
+            continue
+        first = abs(c[0])
+        for xi in c[1:]:
+            uf.union(first, abs(xi))
+
+    rows = {}
+    for i, c in enumerate(clauses):
+        if len(c) > 0:
+            rows.setdefault(uf.find(abs(c[0])), []).append(i)
+
+    components = []
+    for root, idx in rows.items():
+        variables = sorted({abs(xi) for i in idx for xi in clauses[i]})
+        components.append((np.array(variables, dtype=np.int64), idx))
+    components.sort(key=lambda comp: len(comp[0]), reverse=True)
+
+    return components
+
+def split_formula(clauses, n_vars):
+
+    # RETURN : list of (var_map, clauses) per component, with the variables renumbered from 1
+    # (variable i+1 of a component is the variable var_map[i] of the formula), None if the
+    # formula has an empty clause (UNSAT)
+    if any(len(c) == 0 for c in clauses):
+        return None
+
+    parts = []
+    for variables, idx in connected_components(clauses, n_vars):
+        new_var = {int(var): i+1 for i, var in enumerate(variables)}
+        part = [
+            sorted([new_var[xi] if xi > 0 else -new_var[-xi] for xi in clauses[i]], key=abs)
+            for i in idx
+        ]
+        parts.append((variables, part))
+
+    return parts
+
+def residual_formula(clauses, fixing):
+
+    # clauses left by a fixing {var: 0/1}: satisfied ones are dropped, false literals removed
+    # RETURN : the residual clauses, None if the fixing falsifies a clause
+    residual = []
+    for c in clauses:
+        remaining = []
+        satisfied = False
+        for xi in c:
+            value = fixing.get(abs(xi))
+            if value is None:
+                remaining.append(xi)
+            elif (value == 1) == (xi > 0):
+                satisfied = True
+                break
+        if satisfied:
+            continue
+        if len(remaining) == 0:
+            return None
+        residual.append(remaining)
+
+    return residual
\ No newline at end of file
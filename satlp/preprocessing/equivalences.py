@@ -0,0 +1,78 @@
+def implication_graph(binary_clauses):
+    # (a or b) gives the implications ~a -> b and ~b -> a
+    edges = {}
+    for a, b in binary_clauses:
+        edges.setdefault(-a, []).append(b)
+        edges.setdefault(-b, []).append(a)
+
+    return edges
+
+def strongly_connected_components(edges):
+
+    # Tarjan's algorithm with an explicit stack of (node, iterator over its successors)
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    components = []
+    counter = 0
+    for root in list(edges):
+        if root in index:
+            continue
+
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(edges.get(root, ())))]
+        while len(work) > 0:
+            v, successors = work[-1]
+            descended = False
+            for w in successors:
+                if w not in index:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack.add(w)
+                    work.append((w, iter(edges.get(w, ()))))
+                    descended = True
+                    break
+                elif w in on_stack:
+                    low[v] = min(low[v], index[w])
+            if descended:
+                continue
+
+            work.pop()
+            if len(work) > 0:
+                u = work[-1][0]
+                low[u] = min(low[u], low[v])
+
+            if low[v] == index[v]:
+                component = []
+                while True:
+                    w = stack.pop()
+                    on_stack.discard(w)
+                    component.append(w)
+                    if w == v:
+                        break
+                components.append(component)
+
+    return components
+
+def equivalent_literals(binary_clauses):
+
+    # RETURN : literal -> representative of its component (lowest variable) for the literals
+    # that are not their own representative, None if a literal is equivalent to its negation
+    representative = {}
+    for component in strongly_connected_components(implication_graph(binary_clauses)):
+        if len(component) < 2:
+            continue
+        members = set(component)
+        if any(-xi in members for xi in members):
+            return None
+        rep = min(component, key=abs)
+        for xi in component:
+            if xi != rep:
+                representative[xi] = rep
+
+    return representative
\ No newline at end of file
@@ -0,0 +1,266 @@
+import numpy as np
+from satlp.preprocessing.equivalences import equivalent_literals
+
+class Preprocessor:
+
+    def __init__(self, clauses, n_vars, max_occurrences=16, max_resolvent=20, rounds=3):
+        self.n_vars = n_vars
+        self.original = [list(c) for c in clauses]
+
+        # bounded variable elimination: only variables with at most max_occurrences clauses,
+        # whose resolvents have at most max_resolvent literals
+        self.max_occurrences = max_occurrences
+        self.max_resolvent = max_resolvent
+        self.rounds = rounds
+
+        # clause id -> frozenset of literals (None once removed), literal -> ids of its clauses
+        self.clauses = []
+        self.occ = {}
+        self.index = {}
+        self.units = []
+        self.unsat = False
+
+        # reconstruction stack of (literal, clause): going backwards, literal is set to true
+        # whenever clause is not satisfied
+        self.stack = []
+        self.eliminated = set()
+        # reduced variable i+1 -> variable var_map[i] of the input formula
+        self.var_map = None
+
+        for c in clauses:
+            self.add(c)
+
+    def add(self, literals):
+        # RETURN : the id of the new clause, None for tautologies, duplicates and empty clauses
+        clause = frozenset(literals)
+        if len(clause) == 0:
+            self.unsat = True
+            return None
+        if clause in self.index or any(-xi in clause for xi in clause):
+            return None
+
+        idx = len(self.clauses)
+        self.clauses.append(clause)
+        self.index[clause] = idx
+        for xi in clause:
+            if xi in self.occ:
+                self.occ[xi].add(idx)
+            else:
+                self.occ[xi] = {idx}
+        if len(clause) == 1:
+            self.units.append(idx)
+
+        return idx
+
+    def remove(self, idx):
+        clause = self.clauses[idx]
+        for xi in clause:
+            self.occ[xi].discard(idx)
+        del self.index[clause]
+        self.clauses[idx] = None
+
+    def strengthen(self, idx, literal):
+        # RETURN : the id of the clause without literal (the clause is re-added)
+        clause = self.clauses[idx]
+        self.remove(idx)
+        return self.add(clause - {literal})
+
+    def occurrences(self, literal):
+        return self.occ.get(literal, set())
+
+    def n_clauses(self):
+        return len(self.index)
+
+    def propagate_units(self):
+        while len(self.units) > 0 and not self.unsat:
+            idx = self.units.pop()
+            if self.clauses[idx] is None:
+                continue
+
+            literal = next(iter(self.clauses[idx]))
+            self.stack.append((literal, (literal,)))
+            self.eliminated.add(abs(literal))
+            for c in list(self.occurrences(literal)):
+                self.remove(c)
+            for c in list(self.occurrences(-literal)):
+                self.strengthen(c, -literal)
+
+    def pure_literals(self):
+        # literals whose negation appears nowhere are set to true with their clauses removed
+        changed = True
+        while changed:
+            changed = False
+            for var in range(1, self.n_vars+1):
+                pos, neg = self.occurrences(var), self.occurrences(-var)
+                if (len(pos) > 0) == (len(neg) > 0):
+                    continue
+                literal = var if len(pos) > 0 else -var
+                self.stack.append((literal, (literal,)))
+                self.eliminated.add(var)
+                for c in list(self.occurrences(literal)):
+                    self.remove(c)
+                changed = True
+
+    def substitute_equivalences(self):
+
+        # literals equivalent through cycles of binary clauses are replaced by the representative
+        # of their strongly connected component
+        binary = [tuple(c) for c in self.clauses if c is not None and len(c) == 2]
+        representative = equivalent_literals(binary)
+        if representative is None:
+            self.unsat = True
+            return
+
+        affected = set()
+        for literal, rep in representative.items():
+            if literal > 0:
+                # x = rep: x is set back to the value of rep
+                self.stack.append((literal, (literal, -rep)))
+                self.stack.append((-literal, (-literal, rep)))
+                self.eliminated.add(literal)
+            affected |= self.occurrences(literal)
+
+        for c in affected:
+            clause = self.clauses[c]
+            self.remove(c)
+            self.add([representative.get(xi, xi) for xi in clause])
+
+    def subsume(self):
+
+        # backward subsumption (C in D: D is removed) and self-subsuming resolution
+        # (C \ {l} in D and ~l in D: ~l is removed from D), shortest clauses first
+        queue = sorted(
+            [i for i, c in enumerate(self.clauses) if c is not None],
+            key=lambda i: len(self.clauses[i])
+        )
+        k = 0
+        while k < len(queue) and not self.unsat:
+            idx = queue[k]
+            k += 1
+            clause = self.clauses[idx]
+            if clause is None:
+                continue
+
+            # every candidate contains the least frequent variable of the clause
+            pivot = min(clause, key=lambda xi: len(self.occurrences(xi)) + len(self.occurrences(-xi)))
+            for d in list(self.occurrences(pivot) | self.occurrences(-pivot)):
+                other = self.clauses[d]
+                if d == idx or other is None or len(other) < len(clause):
+                    continue
+                diff = clause - other
+                if len(diff) == 0:
+                    self.remove(d)
+                elif len(diff) == 1 and -next(iter(diff)) in other:
+                    new = self.strengthen(d, -next(iter(diff)))
+                    if new is not None:
+                        queue.append(new)
+
+    def eliminate(self, var):
+
+        # replaces the clauses of var by their non tautological resolvents when this does not
+        # add clauses; RETURN : True if var was eliminated
+        pos, neg = list(self.occurrences(var)), list(self.occurrences(-var))
+        if len(pos) + len(neg) > self.max_occurrences:
+            return False
+
+        resolvents = []
+        for p in pos:
+            for n in neg:
+                resolvent = (self.clauses[p] - {var}) | (self.clauses[n] - {-var})
+                if any(-xi in resolvent for xi in resolvent):
+                    continue
+                if len(resolvent) > self.max_resolvent or len(resolvents) >= len(pos) + len(neg):
+                    return False
+                resolvents.append(resolvent)
+
+        # the clauses of var first, then ~var: set back to var if one of them is unsatisfied
+        for p in pos:
+            self.stack.append((var, tuple(self.clauses[p])))
+        self.stack.append((-var, (-var,)))
+        self.eliminated.add(var)
+
+        for c in pos + neg:
+            self.remove(c)
+        for resolvent in resolvents:
+            self.add(resolvent)
+
+        return True
+
+    def eliminate_variables(self):
+        candidates = [
+            var for var in range(1, self.n_vars+1)
+            if var not in self.eliminated and len(self.occurrences(var)) + len(self.occurrences(-var)) > 0
+        ]
+        candidates.sort(key=lambda var: len(self.occurrences(var))*len(self.occurrences(-var)))
+        for var in candidates:
+            if self.unsat:
+                break
+            if self.eliminate(var):
+                self.propagate_units()
+
+    def run(self):
+
+        # RETURN : the reduced clauses (sorted on the variable, like CNFLoader) and their number
+        # of variables, renumbered from 1
+        for _ in range(self.rounds):
+            size = (self.n_clauses(), len(self.eliminated))
+            self.propagate_units()
+            self.substitute_equivalences()
+            self.propagate_units()
+            self.pure_literals()
+            self.subsume()
+            self.propagate_units()
+            self.eliminate_variables()
+            if self.unsat or size == (self.n_clauses(), len(self.eliminated)):
+                break
+
+        return self.compact()
+
+    def compact(self):
+
+        if self.unsat:
+            # x1 and ~x1 keep the reduced formula unsatisfiable
+            self.var_map = np.array([1])
+            return [[1], [-1]], 1
+
+        clauses = [c for c in self.clauses if c is not None]
+        if len(clauses) == 0:
+            # every clause was removed: a single unit clause keeps the LPs non empty, extend
+            # repairs x1 if the reconstruction stack needs another value
+            self.var_map = np.array([1])
+            return [[1]], 1
+
+        variables = sorted({abs(xi) for c in clauses for xi in c})
+        self.var_map = np.array(variables, dtype=np.int64)
+        new_var = {var: i+1 for i, var in enumerate(variables)}
+        reduced = [
+            sorted([new_var[xi] if xi > 0 else -new_var[-xi] for xi in c], key=abs)
+            for c in clauses
+        ]
+
+        return reduced, len(variables)
+
+    def apply(self, cnf_handler):
+        # replaces the clauses of cnf_handler by the reduced ones
+        clauses, n_vars = self.run()
+        cnf_handler.clauses = clauses
+        cnf_handler.n_vars = n_vars
+        cnf_handler.m_clauses = len(clauses)
+
+    def extend(self, witness):
+
+        # reduced 0/1 witness -> 0/1 assignment of the variables of the input formula
+        values = np.zeros(self.n_vars+1, dtype=bool)
+        witness = np.asarray(witness, dtype=float)[:len(self.var_map)]
+        values[self.var_map[:len(witness)]] = witness == 1
+
+        for literal, clause in reversed(self.stack):
+            if not any(values[abs(xi)] == (xi > 0) for xi in clause):
+                values[abs(literal)] = literal > 0
+
+        return values[1:].astype(float)
+
+    def verify(self, witness):
+        # witness over the variables of the input formula, checked against its clauses
+        values = np.concatenate([[0.0], np.asarray(witness, dtype=float)[:self.n_vars]])
+        return all(any(values[abs(xi)] == (xi > 0) for xi in c) for c in self.original)
\ No newline at end of file
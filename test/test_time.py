@@ -49,30 +49,38 @@ def create_parser():
         default=100, 
     )
 
+    parser.add_argument(
+        "-c", 
+        "--cache_dir", 
+        type=str, 
+        default=None, 
+        help="Directory of the parsed formulas: every solver after the first one skips parsing the file."
+    )
+
 
     return parser
 
 def _worker(args):
 
-    file, method = args
+    file, method, cache_dir = args
 
-    hyb_solver_feas = HybridSolver(file, SATasLPOptimizationDual, method=method)
+    hyb_solver_feas = HybridSolver(file, SATasLPOptimizationDual, method=method, cache_dir=cache_dir)
     hyb_start_feas = time()
     hyb_witness_feas = hyb_solver_feas.optimize(generate_cut=hyb_solver_feas.generate_feas_cut)
     hyb_stop_feas = time()
 
-    hyb_solver_opt = HybridSolver(file, SATasLPOptimizationDual, method=method)
+    hyb_solver_opt = HybridSolver(file, SATasLPOptimizationDual, method=method, cache_dir=cache_dir)
     hyb_start_opt = time()
     hyb_witness_opt = hyb_solver_opt.optimize(generate_cut=hyb_solver_opt.generate_cut_symm)
     hyb_stop_opt = time()
 
-    hyb_solver_wp = HybridSolver(file, SATasLPOptimizationDual, method=method)
+    hyb_solver_wp = HybridSolver(file, SATasLPOptimizationDual, method=method, cache_dir=cache_dir)
     hyb_start_wp = time()
     hyb_witness_wp = hyb_solver_wp.optimize(generate_cut=hyb_solver_wp.generate_cut_via_weak_projection)
     hyb_stop_wp = time()
 
 
-    sat_solver = BooleanSolver(file, verbose=0)
+    sat_solver = BooleanSolver(file, verbose=0, cache_dir=cache_dir)
     bool_start = time()
     bool_witness = sat_solver.solve()
     bool_stop = time()
@@ -157,6 +165,7 @@ if __name__ == "__main__":
     files_dir = args.dir if args.dir[-1] != '/' else args.dir[:-1]
     method = args.method
     n_formulas = args.n_formulas
+    cache_dir = args.cache_dir
     
     files = [f"{files_dir}/{f}" for f in os.listdir(files_dir)]
     files = np.random.choice(files, n_formulas)
@@ -194,6 +203,6 @@ if __name__ == "__main__":
         with mp.Pool(n_processes) as p:
             chunksize = round(len(files)/n_processes)
             chunksize = chunksize if chunksize > 0 else len(files)
-            csv_list = p.map(worker_fn, zip(files, [method]*len(files)), chunksize=chunksize)
+            csv_list = p.map(worker_fn, zip(files, [method]*len(files), [cache_dir]*len(files)), chunksize=chunksize)
             for csv_values in csv_list:
                 writer.writerow(csv_values)